@@ -1,26 +1,135 @@
+import numpy as np
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-from streamlit_plotly_events import plotly_events
-import folium
-from streamlit_folium import st_folium
+from uuid import uuid4
+import profiling
+from checkpoints import points_passage, temps_aux_distances
+from course_cache import cache_defaut
+from downsample import indices_affichage
+from formats import EXTENSIONS
+from geometry import indices_carte
+from gpx_stream import DISTANCE_MIN
+from montecarlo import distribution_temps
+from segment_index import IndexSegments
+from formatting import (
+    allures_secondes,
+    formater_allures,
+    formater_allures_min_km,
+    formater_temps,
+    vitesses_ascensionnelles,
+)
+from models import get_modele
 from utils import (
-    process_gpx,
+    charger_course,
     trouver_vitesse_plate,
     compute_cumulative_time,
     format_time,
     compute_paces,
     calculate_deniv,
-    trouver_vitesse_plate_strava,
-    compute_cumulative_time_strava,
-    compute_paces_strava,
     vitesse_to_allure,
-    adjusted_speed_minetti,
-    adjusted_speed_strava,
-    allure_to_v_asc,
-    allure_to_seconds
 )
 
+# Instrumentation (désactivée par défaut) : SIMULATEUR_PROFILING=1 ou ?debug=1 dans l'URL
+# réévalué à chaque rerun : retirer ?debug=1 désactive l'instrumentation
+profiling.activer(st.query_params.get("debug") == "1" or profiling.ACTIF_ENV)
+profiling.demarrer_run(st.session_state.setdefault("id_session", uuid4().hex))
+
+
+## -- MEMOISATION --
+# Les calculs sont gardés par (parcours, réglages de lecture, temps espéré, modèle) et partagés
+# entre les reruns et les sessions : modifier le temps espéré ne relit pas le GPX, ouvrir un
+# expander ou déplacer le curseur ne relance aucun calcul. st.cache_resource ne copie pas
+# les résultats (ils ne sont jamais modifiés) ; les arguments préfixés par _ ne font pas
+# partie de la clé.
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def lire_parcours(cle_profil, _gpx_bytes):
+    _, lissage, fenetre_lissage, distance_min = cle_profil
+    with profiling.etape("lecture", octets=len(_gpx_bytes)):
+        course = charger_course(_gpx_bytes, cache_defaut(), lissage, fenetre_lissage, distance_min=distance_min)
+        parcours = cache_defaut().charger_parcours(_gpx_bytes, distance_min)
+        d_plus, d_moins = calculate_deniv(course.elevations)
+        points = points_passage(parcours)
+    return {"distances": course.distances, "elevations": course.elevations, "distances_pace": course.distances_pace,
+            "parcours": parcours, "d_plus": d_plus, "d_moins": d_moins, "points": points}
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def simuler(cle_profil, temps_espere_sec, model, _profil):
+    """VAP, temps cumulés et allures pour un (parcours, temps espéré, modèle)."""
+    distances, elevations = _profil["distances"], _profil["elevations"]
+    with profiling.etape("simulation", modele=model):
+        flat_speed = trouver_vitesse_plate(distances, elevations, temps_espere_sec, model=model)
+        return {"vitesse": flat_speed,
+                "temps": np.asarray(compute_cumulative_time(flat_speed, distances, elevations, model)),
+                "allures": np.asarray(compute_paces(distances, elevations, flat_speed, model), dtype=float)}
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def analyser_passages(cle_profil, temps_espere_sec, _profil, _simulations):
+    """Index des segments (curseur) et temps aux points de passage."""
+    temps = {model: sim["temps"] for model, sim in _simulations.items()}
+    index = IndexSegments(_profil["distances_pace"], _profil["elevations"], temps)
+    passages = temps_aux_distances(_profil["points"].distances, _profil["distances"], list(temps.values()))
+    return index, passages
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def fourchettes(cle_profil, temps_espere_sec, _profil, _simulations):
+    with profiling.etape("monte_carlo"):
+        return {nom: distribution_temps(_profil["distances"], _profil["elevations"], _simulations[model]["vitesse"],
+                                        model, _profil["points"].distances, graine=0)
+                for nom, model in (("Minetti", "minetti"), ("Strava", "strava"))}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def courbes_pentes(flat_speed, pentes):
+    """Allures (texte et secondes) et vitesses verticales (m/h) des 2 modèles pour chaque pente."""
+    courbes = {}
+    for nom, model in (("Minetti", "minetti"), ("Strava", "strava")):
+        vitesses = flat_speed * get_modele(model).facteurs_exacts(pentes)
+        secondes = allures_secondes(vitesses)
+        courbes[nom] = (formater_allures(vitesses), secondes,
+                        np.round(vitesses_ascensionnelles(secondes, pentes)).astype(int))
+    return courbes
+
+
+@st.fragment
+def stats_segment(index_segments, distance_totale):
+    """Curseur et statistiques du segment choisi (fragment : relancé seul quand le curseur bouge)."""
+    st.markdown("### 📍 Sélectionner un segment")
+    start_km, end_km = st.slider(
+        "Choisissez deux distances (en km)",
+        min_value=0.0,
+        max_value=distance_totale,
+        value=(0.0, distance_totale),
+        step=0.1
+    )
+
+    if start_km >= end_km:
+        st.warning("⚠️ La distance d'arrivée doit être supérieure à la distance de départ.")
+    else:
+        stats = index_segments.stats(start_km, end_km)
+
+        if stats is not None:
+            # Distance, temps, vitesse, allure
+            d_total = stats["distance"]
+            t_total = stats["temps"]["minetti"]
+            v_moy = (d_total * 1000) / t_total  # m/s
+            allure_moyenne = vitesse_to_allure(v_moy)
+
+            t_total_strava = stats["temps"]["strava"]
+            v_moy_strava = (d_total * 1000) / t_total_strava
+            allure_moyenne_strava = vitesse_to_allure(v_moy_strava)
+
+            # D+ / D- sur le segment
+            d_plus_seg, d_moins_seg = round(stats["d_plus"]), round(stats["d_moins"])
+
+            st.success(f"📏 Distance : {d_total:.2f} km  •  🧗 D+ : {d_plus_seg} m  •  ⬇️ D- : {abs(d_moins_seg)} m")
+            st.info(f"Minetti - ⏱ Durée estimée : {format_time(t_total)} • 🏃 Allure : {allure_moyenne}/km")
+            st.warning(f"Strava  - ⏱ Durée estimée : {format_time(t_total_strava)} • 🏃 Allure : {allure_moyenne_strava}/km")
+        else:
+            st.warning("Pas assez de points pour faire le calcul.")
+
 st.title("Analyse de trace GPX - Allure ajustée à la pente")
 st.info(
     """
@@ -40,17 +149,30 @@ st.info(
     """
 )
 
-uploaded_file = st.file_uploader("Chargez votre fichier GPX", type=["gpx"])
+uploaded_file = st.file_uploader("Chargez votre parcours (GPX, TCX, FIT ou GeoJSON)",
+                                 type=[extension.lstrip(".") for extension in EXTENSIONS])
 
 ## -- AFFICHAGE DES INFOS RELATIVE AU PARCOURS --
 
 if uploaded_file is not None:
 
-    gpx_content = uploaded_file.read().decode("utf-8")
-
-    # Lecture brute : distances et altitudes
-    distances, elevations, distances_pace, coords = process_gpx(gpx_content)
-    d_plus, d_moins = calculate_deniv(elevations)
+    # Lecture brute en flux : distances et altitudes
+    gpx_bytes = uploaded_file.getvalue()
+    lissages = {"Aucun": None, "Moyenne glissante": "moyenne", "Gaussien": "gaussien", "Savitzky-Golay": "savgol"}
+    col_lissage, col_fenetre, col_decimation = st.columns([2, 1, 1])
+    with col_lissage:
+        lissage = lissages[st.selectbox("Lissage de l'altitude", list(lissages))]
+    with col_fenetre:
+        fenetre_lissage = st.number_input("Fenêtre (m)", min_value=10, max_value=2000, value=100, step=10,
+                                          disabled=lissage is None)
+    with col_decimation:
+        distance_min = st.number_input("Écart entre points (m)", min_value=0, max_value=500, value=DISTANCE_MIN,
+                                       step=10, help="Distance minimale entre 2 points du profil (0 : tous les points)")
+    cle_profil = (cache_defaut().cle_parcours(gpx_bytes), lissage, fenetre_lissage, distance_min)
+    profil = lire_parcours(cle_profil, gpx_bytes)
+    distances, elevations, distances_pace = profil["distances"], profil["elevations"], profil["distances_pace"]
+    parcours, points = profil["parcours"], profil["points"]
+    d_plus, d_moins = profil["d_plus"], profil["d_moins"]
 
     st.markdown("""
     <div style='background-color: rgba(255,0,0,0.25); padding: 0px; border-radius: 10px; margin-bottom: 0px;'>
@@ -59,15 +181,24 @@ if uploaded_file is not None:
         </div>
     """, unsafe_allow_html=True)
     # Créer la carte centrée sur le point moyen
-    if coords:
-        lat_moy = sum(lat for lat, lon in coords) / len(coords)
-        lon_moy = sum(lon for lat, lon in coords) / len(coords)
+    if len(parcours["lats"]):
+        import folium
+        from streamlit_folium import st_folium
 
-        m = folium.Map(location=[lat_moy, lon_moy], zoom_start=13, tiles='OpenStreetMap',attr='© OpenStreetMap contributors')
-        m.fit_bounds(coords)
+        lats, lons = parcours["lats"], parcours["lons"]
+        lat_moy = float(lats.mean())
+        lon_moy = float(lons.mean())
 
-        folium.PolyLine(coords, color="blue", weight=3).add_to(m)
-        st_folium(m, width=700, height=500)
+        m = folium.Map(location=[lat_moy, lon_moy], zoom_start=13, tiles='OpenStreetMap',attr='© OpenStreetMap contributors')
+        m.fit_bounds([[float(lats.min()), float(lons.min())], [float(lats.max()), float(lons.max())]])
+
+        # Tracé simplifié (Douglas-Peucker) : le niveau le plus fin qui tient dans le budget de points
+        with profiling.etape("carte"):
+            idx_carte = indices_carte(parcours["importance"])
+            profiling.noter(points=len(idx_carte))
+            folium.PolyLine(np.column_stack((lats[idx_carte], lons[idx_carte])).tolist(), color="blue", weight=3).add_to(m)
+            # returned_objects=[] : zoomer ou déplacer la carte ne relance pas le script
+            st_folium(m, width=700, height=500, returned_objects=[])
     else:
         st.warning("Impossible de récupérer les coordonnées GPS.")
 
@@ -111,6 +242,8 @@ if uploaded_file is not None:
 
 ## -- CALCUL DE L'ALLURE AU COURS DU TEMPS
 if uploaded_file is not None and temps_espere:
+    # plotly n'est chargé qu'une fois un parcours affiché (démarrage à froid, voir mesure_demarrage.py)
+    import plotly.graph_objects as go
 
     # Conversion temps espéré en secondes
     try:
@@ -148,8 +281,9 @@ if uploaded_file is not None and temps_espere:
 
     
     # Trouver la vitesse sur plat correcte
-    flat_speed = trouver_vitesse_plate(distances, elevations, temps_espere_sec)
-    flat_speed_strava = trouver_vitesse_plate_strava(distances, elevations, temps_espere_sec)
+    simulations = {model: simuler(cle_profil, temps_espere_sec, model, profil) for model in ("minetti", "strava")}
+    flat_speed = simulations["minetti"]["vitesse"]
+    flat_speed_strava = simulations["strava"]["vitesse"]
 
 
     # Calcul de l'allure ajustée correspondante
@@ -187,26 +321,10 @@ if uploaded_file is not None and temps_espere:
 
     pentes = list(range(-30, 35, 1))  # de -30% à +35% tous les 5%
 
-        # Construire les listes d'allures
-    allures_minetti = []
-    allures_strava = []
-    vitesses_asc_minetti = []
-    vitesses_asc_strava = []
-
-    for pente in pentes:
-        v_minetti = adjusted_speed_minetti(flat_speed, pente)
-        v_strava = adjusted_speed_strava(flat_speed, pente)
-        allure_minetti = vitesse_to_allure(v_minetti)
-        allure_strava = vitesse_to_allure(v_strava)
-        v_asc_minetti = allure_to_v_asc(allure_minetti,pente)
-        v_asc_strava = allure_to_v_asc(allure_strava,pente)
-        vitesses_asc_minetti.append(round(v_asc_minetti))
-        vitesses_asc_strava.append(round(v_asc_strava))
-        allures_minetti.append(allure_minetti)
-        allures_strava.append(allure_strava)
-
-    y_minetti = [allure_to_seconds(a) for a in allures_minetti]
-    y_strava = [allure_to_seconds(a) for a in allures_strava]
+    # Listes d'allures (mémorisées par VAP)
+    courbes = courbes_pentes(flat_speed, pentes)
+    allures_minetti, y_minetti, vitesses_asc_minetti = courbes["Minetti"]
+    allures_strava, y_strava, vitesses_asc_strava = courbes["Strava"]
 
     # Fonction pour reformatter en mm:ss
     def seconds_to_mmss(x):
@@ -223,7 +341,7 @@ if uploaded_file is not None and temps_espere:
         y=y_minetti,
         mode='lines',
         name='Minetti',
-        customdata=list(zip(allures_minetti, vitesses_asc_minetti)),
+        customdata=np.column_stack((allures_minetti, vitesses_asc_minetti)),
         hovertemplate=(
             '<span style="color:#1f77b4;">Allure: %{customdata[0]}/km, V verticale: %{customdata[1]} m/h</span><br><extra></extra>'
         ),
@@ -236,7 +354,7 @@ if uploaded_file is not None and temps_espere:
         y=y_strava,
         mode='lines',
         name='Strava',
-        customdata=list(zip(allures_strava, vitesses_asc_strava)),
+        customdata=np.column_stack((allures_strava, vitesses_asc_strava)),
         hovertemplate=(
             '<span style="color:orange;">Allure: %{customdata[0]}/km, V verticale: %{customdata[1]} m/h</span><br><extra></extra>'
         ),
@@ -244,8 +362,8 @@ if uploaded_file is not None and temps_espere:
     ))
 
     # Définir les limites et ticks en allure (y)
-    min_val = int(min(min(y_minetti), min(y_strava)) // 60) * 60
-    max_val = int(max(max(y_minetti), max(y_strava)) // 60 + 2) * 60
+    min_val = int(min(np.nanmin(y_minetti), np.nanmin(y_strava)) // 60) * 60
+    max_val = int(max(np.nanmax(y_minetti), np.nanmax(y_strava)) // 60 + 2) * 60
 
     fig.update_layout(
         title="Allure ajustée en fonction de la pente",
@@ -282,10 +400,11 @@ if uploaded_file is not None and temps_espere:
 
     ## GRAPHE ALTIMETRIE ET TEMPS DE PASSAGE
 
-    # Recalcul du temps cumulé avec la bonne vitesse
-    cumulative_time = compute_cumulative_time(flat_speed, distances, elevations)
-    cumulative_time_strava = compute_cumulative_time_strava(flat_speed_strava, distances, elevations)
-    
+    # Temps cumulés avec la bonne vitesse (mémorisés avec la simulation)
+    cumulative_time = simulations["minetti"]["temps"]
+    cumulative_time_strava = simulations["strava"]["temps"]
+    index_segments, passages = analyser_passages(cle_profil, temps_espere_sec, profil, simulations)
+
     ## PROFIL ALTIMETRIQUE ET DUREE DES SEGMENTS
 
     with st.expander("🏔️ Afficher le profil altimétrique et les temps de passage estimés"):
@@ -294,9 +413,11 @@ if uploaded_file is not None and temps_espere:
         fig = go.Figure()
 
         # Profil Altitude
+        # Seuls les points retenus (forme + sommets/creux) sont envoyés au navigateur
+        idx_profil = indices_affichage(distances_pace, [elevations[1:]])
         fig.add_trace(go.Scatter(
-            x=distances_pace,
-            y=elevations[1:],  # pour correspondre aux distances_pace
+            x=distances_pace[idx_profil],
+            y=elevations[idx_profil + 1],  # pour correspondre aux distances_pace
             mode='lines',
             name='Altitude',
             hovertemplate=(
@@ -305,7 +426,8 @@ if uploaded_file is not None and temps_espere:
                 '<span style="color:#1f77b4;">Minetti: %{customdata[0]}</span><br>'
                 '<span style="color:orange;">Strava: %{customdata[1]}</span>'
             ),
-            customdata=[[format_time(t), format_time(ts)] for t, ts in zip(cumulative_time, cumulative_time_strava)]
+            customdata=np.column_stack((formater_temps(cumulative_time[idx_profil]),
+                                        formater_temps(cumulative_time_strava[idx_profil])))
         ))
 
         # Configuration
@@ -329,62 +451,53 @@ if uploaded_file is not None and temps_espere:
         )
         st.plotly_chart(fig, use_container_width=True)
 
-        # Sélection avec slider
-        st.markdown("### 📍 Sélectionner un segment")
-        start_km, end_km = st.slider(
-            "Choisissez deux distances (en km)",
-            min_value=0.0,
-            max_value=float(distances[-1]),
-            value=(0.0, float(distances[-1])),
-            step=0.1
-        )
-
-        if start_km >= end_km:
-            st.warning("⚠️ La distance d'arrivée doit être supérieure à la distance de départ.")
-        else:
-            indices = [i for i, d in enumerate(distances_pace) if start_km <= d <= end_km]
+        # Sélection avec slider : seul ce fragment est relancé quand le curseur bouge
+        stats_segment(index_segments, float(distances[-1]))
 
-            if len(indices) >= 2:
-                # Distance, temps, vitesse, allure
-                d_total = distances_pace[indices[-1]] - distances_pace[indices[0]]
-                t_total = cumulative_time[indices[-1]] - cumulative_time[indices[0]]
-                v_moy = (d_total * 1000) / t_total  # m/s
-                allure_moyenne = vitesse_to_allure(v_moy)
 
-                t_total_strava = cumulative_time_strava[indices[-1]] - cumulative_time_strava[indices[0]]
-                v_moy_strava = (d_total * 1000) / t_total_strava
-                allure_moyenne_strava = vitesse_to_allure(v_moy_strava)
 
-                # D+ / D- sur le segment
-                sub_elevations = elevations[indices[0]+1 : indices[-1]+2]  # +1 car distances_pace démarre à point 1
-                d_plus_seg, d_moins_seg = calculate_deniv(sub_elevations)
 
-                st.success(f"📏 Distance : {d_total:.2f} km  •  🧗 D+ : {d_plus_seg} m  •  ⬇️ D- : {abs(d_moins_seg)} m")
-                st.info(f"Minetti - ⏱ Durée estimée : {format_time(t_total)} • 🏃 Allure : {allure_moyenne}/km")
-                st.warning(f"Strava  - ⏱ Durée estimée : {format_time(t_total_strava)} • 🏃 Allure : {allure_moyenne_strava}/km")
-            else:
-                st.warning("Pas assez de points pour faire le calcul.")
+    ## TEMPS DE PASSAGE AUX RAVITAILLEMENTS (waypoints du GPX)
 
+    if len(points.noms):
+        with st.expander("🥤 Afficher les temps de passage aux ravitaillements"):
+            st.dataframe({"Point": points.noms, "Distance (km)": points.distances.round(2),
+                          "Minetti": formater_temps(passages[0]), "Strava": formater_temps(passages[1])},
+                         use_container_width=True, hide_index=True)
 
+    ## FOURCHETTE DE TEMPS (incertitude sur la VAP, le plafond et le modèle de coût)
 
+    with st.expander("🎲 Afficher la fourchette de temps (Monte Carlo)"):
+        distributions = fourchettes(cle_profil, temps_espere_sec, profil, simulations)
+        st.caption("Temps atteints dans 10 %, 50 % et 90 % des 5000 simulations, en faisant varier la VAP "
+                   "(±5 %), le plafond en descente (±10 %) et les coefficients du modèle (±5 %).")
+        # une ligne par point de passage, puis l'arrivée ; une colonne par (modèle, percentile)
+        tableau = {"Point": np.append(points.noms, "Arrivée"),
+                   "Distance (km)": np.append(points.distances, distances[-1]).round(2)}
+        for modele, dist in distributions.items():
+            temps = np.column_stack((dist.passages, dist.arrivee))
+            for q, ligne in zip(dist.quantiles, temps):
+                tableau[f"{modele} P{q}"] = formater_temps(ligne)
+        st.dataframe(tableau, use_container_width=True, hide_index=True)
 
     ## ALLURE INSTANTANEE
 
-    paces = compute_paces(distances, elevations, flat_speed)
-    paces_strava = compute_paces_strava(distances, elevations, flat_speed_strava)
-    paces_str = []
-    paces_str_strava = []
-    for i in range(len(paces)):
-        paces_str.append(vitesse_to_allure(1000/(60*paces[i])))
-        paces_str_strava.append(vitesse_to_allure(1000/(60*paces_strava[i])))
+    with profiling.etape("allures"):
+        paces = simulations["minetti"]["allures"]
+        paces_strava = simulations["strava"]["allures"]
+        idx_allures = indices_affichage(distances_pace, [paces, paces_strava])
+        profiling.noter(points_affiches=len(idx_allures))
+        paces_str = formater_allures_min_km(paces[idx_allures])
+        paces_str_strava = formater_allures_min_km(paces_strava[idx_allures])
+        x_allures = distances_pace[idx_allures]
 
 
     fig2 = go.Figure()
 
     # 1. Courbe Minetti (bleu)
     fig2.add_trace(go.Scatter(
-        x=distances_pace,
-        y=paces,
+        x=x_allures,
+        y=paces[idx_allures],
         mode='lines',
         name='Allure Minetti',
         line=dict(color='#1f77b4'),
@@ -394,8 +507,8 @@ if uploaded_file is not None and temps_espere:
 
     # 2. Courbe Strava (orange)
     fig2.add_trace(go.Scatter(
-        x=distances_pace,
-        y=paces_strava,
+        x=x_allures,
+        y=paces_strava[idx_allures],
         mode='lines',
         name='Allure Strava',
         line=dict(color='orange', dash='dash'),  # tirets pour différencier
@@ -474,3 +587,12 @@ with st.expander("⚙️ Voir explication du calcul"):
         unsafe_allow_html=True
     )
 
+if profiling.actif():
+    with st.expander("⏱️ Temps par étape (debug)"):
+        mesures = profiling.mesures_run()
+        st.dataframe([
+            {"étape": "  " * m["niveau"] + m["etape"], "durée (ms)": m["duree_ms"],
+             **{k: v for k, v in m.items() if k not in ("etape", "niveau", "duree_ms", "session", "horodatage")}}
+            for m in mesures
+        ], use_container_width=True)
+        st.caption(f"Cache des parcours : {cache_defaut().stats} • mesures aussi écrites dans {profiling.FICHIER}")
@@ -0,0 +1,83 @@
+"""
+Calcul groupé des allures pour une grille de temps espérés et plusieurs modèles.
+
+Pour chaque modèle, les vitesses ajustées de tous les temps espérés sont calculées d'un
+bloc par broadcasting (temps espérés x segments), puis cumulées : une seule passe sur le
+parcours par bloc de temps espérés au lieu d'un appel au solveur et d'un calcul de temps
+cumulé par objectif. Les blocs sont dimensionnés pour que les tableaux intermédiaires
+restent sous `memoire_max` octets.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from models import get_modele
+from solver import resoudre_vitesse_plate, temps_parcours
+from utils import segment_arrays
+
+MEMOIRE_MAX = 256 * 1024**2  # octets pour les tableaux intermédiaires d'un bloc
+
+
+@dataclass
+class PlanAllures:
+    temps_espere: np.ndarray  # (n_temps,) en secondes
+    modeles: list  # noms des modèles
+    vitesses_plates: np.ndarray  # (n_modeles, n_temps) en m/s
+    temps_cumules: np.ndarray  # (n_modeles, n_temps, n_points) en secondes
+
+
+def grille_temps(debut_sec, fin_sec, pas_sec=15 * 60):
+    """Temps espérés de debut_sec à fin_sec inclus, tous les pas_sec secondes."""
+    return np.arange(debut_sec, fin_sec + pas_sec / 2, pas_sec, dtype=float)
+
+
+def _temps_cumules_bloc(speeds_fn, flat_speeds, d, slopes, out):
+    """Temps cumulés (len(flat_speeds), n_points) écrits dans out."""
+    v_adj = speeds_fn(flat_speeds[:, None], slopes[None, :])
+    dt = np.zeros_like(v_adj)
+    np.divide(d[None, :], v_adj, out=dt, where=v_adj > 0)
+    out[:, 0] = 0.0
+    np.cumsum(dt, axis=1, out=out[:, 1:])
+
+
+def plan_allures(distances, elevations, temps_espere, models=("minetti", "strava"),
+                 precision=1, memoire_max=MEMOIRE_MAX):
+    """
+    Vitesses sur plat et temps de passage pour chaque (modèle, temps espéré).
+
+    Args:
+        distances (list of float): Distances cumulées en km.
+        elevations (list of float): Altitudes correspondantes en mètres.
+        temps_espere (array of float): Temps totaux espérés en secondes.
+        models (list): Modèles (noms ou ModeleCout).
+        precision (float): Précision souhaitée en secondes sur le temps total.
+        memoire_max (int): Taille maximale en octets des tableaux intermédiaires d'un bloc.
+
+    Returns:
+        PlanAllures
+    """
+    temps_espere = np.atleast_1d(np.asarray(temps_espere, dtype=float))
+    d, slopes = segment_arrays(distances, elevations)
+    n_points = len(d) + 1
+    modeles = [get_modele(m) for m in models]
+
+    vitesses = np.empty((len(modeles), len(temps_espere)))
+    temps_cumules = np.empty((len(modeles), len(temps_espere), n_points))
+    # v_adj et dt : 2 tableaux (bloc x segments) de float64
+    taille_bloc = max(1, int(memoire_max // (2 * 8 * max(len(d), 1))))
+
+    for m, modele in enumerate(modeles):
+        speeds_fn = modele.vitesses
+        # forme fermée T(v) = T(1) / v (vérifiée ci-dessous sur le temps cumulé final)
+        t_ref = temps_parcours(speeds_fn, 1.0, d, slopes)
+        vitesses[m] = t_ref / temps_espere
+        for debut in range(0, len(temps_espere), taille_bloc):
+            bloc = slice(debut, debut + taille_bloc)
+            _temps_cumules_bloc(speeds_fn, vitesses[m, bloc], d, slopes, temps_cumules[m, bloc])
+
+        # modèle non homogène (vitesse max absolue...) : solveur pour les objectifs non atteints
+        for k in np.flatnonzero(np.abs(temps_cumules[m, :, -1] - temps_espere) >= precision):
+            vitesses[m, k] = resoudre_vitesse_plate(speeds_fn, d, slopes, temps_espere[k], precision).vitesse
+            _temps_cumules_bloc(speeds_fn, vitesses[m, k:k + 1], d, slopes, temps_cumules[m, k:k + 1])
+
+    return PlanAllures(temps_espere, [m.nom for m in modeles], vitesses, temps_cumules)
@@ -0,0 +1,132 @@
+"""
+Précalcul en parallèle pour un dossier de traces (GPX, TCX, FIT ou GeoJSON, voir formats.py).
+
+Pour chaque fichier : distance, D+ / D- et allure sur plat de chaque modèle pour une liste de
+temps espérés. Les fichiers sont traités dans un pool de processus et chaque résultat est
+écrit dès que le fichier est terminé (une ligne par fichier x modèle x temps espéré).
+Les fichiers illisibles sont notés dans la colonne "erreur" sans arrêter le traitement.
+
+Usage :
+    python batch_gpx.py traces/ -o resultats.csv
+    python batch_gpx.py traces/ -o resultats.parquet --temps 05:00:00 06:30:00 -j 8
+    python batch_gpx.py traces/ -o resultats.csv --grille 05:00:00 09:00:00 00:15:00
+"""
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from batch import grille_temps
+from formats import EXTENSIONS
+from gpx_stream import DISTANCE_MIN
+from utils import calculate_deniv, format_time, process_gpx, trouver_vitesse_plate, vitesse_to_allure
+
+COLONNES = ["fichier", "distance_km", "d_plus", "d_moins", "modele", "temps_espere",
+            "vitesse_plate", "allure_plate", "erreur"]
+
+
+def hhmmss_to_seconds(texte):
+    h, m, s = map(int, texte.split(":"))
+    return h * 3600 + m * 60 + s
+
+
+def traiter_fichier(chemin, temps_espere, models, distance_min=DISTANCE_MIN):
+    """Lignes de résultat pour un fichier de trace (une ligne d'erreur si la lecture échoue)."""
+    nom = os.path.basename(chemin)
+    try:
+        with open(chemin, "rb") as f:
+            distances, elevations, _, _ = process_gpx(f, distance_min=distance_min)
+        if len(distances) < 2:
+            raise ValueError("pas assez de points de trace")
+        d_plus, d_moins = calculate_deniv(elevations)
+        lignes = []
+        for model in models:
+            for t in temps_espere:
+                v = trouver_vitesse_plate(distances, elevations, t, model=model)
+                lignes.append([nom, round(distances[-1], 3), d_plus, d_moins, model, format_time(t),
+                               round(v, 4), vitesse_to_allure(v), ""])
+        return lignes
+    except Exception as e:  # fichier corrompu, XML invalide...
+        return [[nom, None, None, None, None, None, None, None, f"{type(e).__name__}: {e}"]]
+
+
+class _EcrivainCSV:
+    def __init__(self, chemin):
+        self._f = open(chemin, "w", newline="", encoding="utf-8")
+        self._w = csv.writer(self._f)
+        self._w.writerow(COLONNES)
+
+    def ecrire(self, lignes):
+        self._w.writerows(lignes)
+        self._f.flush()
+
+    def fermer(self):
+        self._f.close()
+
+
+class _EcrivainParquet:
+    def __init__(self, chemin):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("La sortie Parquet nécessite pyarrow (pip install pyarrow).")
+        self._pa = pa
+        types = {"distance_km": pa.float64(), "d_plus": pa.int64(), "d_moins": pa.int64(),
+                 "vitesse_plate": pa.float64()}
+        self._schema = pa.schema([(c, types.get(c, pa.string())) for c in COLONNES])
+        self._w = pq.ParquetWriter(chemin, self._schema)
+
+    def ecrire(self, lignes):
+        colonnes = list(zip(*lignes))
+        table = self._pa.table({c: list(col) for c, col in zip(COLONNES, colonnes)}, schema=self._schema)
+        self._w.write_table(table)
+
+    def fermer(self):
+        self._w.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("dossier", help="dossier contenant les traces (.gpx, .tcx, .fit, .geojson)")
+    parser.add_argument("-o", "--sortie", default="resultats.csv", help="fichier .csv ou .parquet")
+    parser.add_argument("-j", "--processus", type=int, default=os.cpu_count(), help="taille du pool")
+    parser.add_argument("--modeles", nargs="+", default=["minetti", "strava"])
+    parser.add_argument("--distance-min", type=float, default=DISTANCE_MIN,
+                        help="distance minimale (m) entre 2 points du profil")
+    groupe = parser.add_mutually_exclusive_group()
+    groupe.add_argument("--temps", nargs="+", metavar="HH:MM:SS", help="temps espérés")
+    groupe.add_argument("--grille", nargs=3, metavar=("DEBUT", "FIN", "PAS"),
+                        default=["05:00:00", "09:00:00", "00:15:00"],
+                        help="grille de temps espérés (défaut : 5h à 9h toutes les 15 min)")
+    args = parser.parse_args(argv)
+
+    if args.temps:
+        temps_espere = [hhmmss_to_seconds(t) for t in args.temps]
+    else:
+        temps_espere = grille_temps(*map(hhmmss_to_seconds, args.grille)).tolist()
+
+    fichiers = sorted(os.path.join(args.dossier, f) for f in os.listdir(args.dossier)
+                      if f.lower().endswith(EXTENSIONS))
+    ecrivain = _EcrivainParquet(args.sortie) if args.sortie.endswith(".parquet") else _EcrivainCSV(args.sortie)
+
+    erreurs = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.processus) as pool:
+            futures = {pool.submit(traiter_fichier, f, temps_espere, args.modeles, args.distance_min): f for f in fichiers}
+            for k, future in enumerate(as_completed(futures), 1):
+                lignes = future.result()
+                if lignes[0][-1]:
+                    erreurs += 1
+                ecrivain.ecrire(lignes)
+                print(f"[{k}/{len(fichiers)}] {os.path.basename(futures[future])}"
+                      + (f" : {lignes[0][-1]}" if lignes[0][-1] else ""), file=sys.stderr)
+    finally:
+        ecrivain.fermer()
+
+    print(f"{len(fichiers)} fichiers traités, {erreurs} en erreur -> {args.sortie}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Mesures de performance des fonctions de utils.py sur des parcours synthétiques.
+
+Les traces GPX sont générées de façon déterministe (graine fixe) de 1k à 1M points et du
+plat au très montagneux. La même trace est aussi écrite en TCX, FIT et GeoJSON pour comparer
+le temps de lecture de chaque format (lecture_<format>, taille du fichier dans "octets").
+Pour chaque fonction on enregistre le temps (meilleur de
+`repetitions` essais), le pic mémoire (tracemalloc) et, pour les solveurs, le nombre
+d'évaluations du parcours. Les résultats sont écrits en JSON ; avec --reference, le script
+échoue (code 1) si une mesure dépasse `seuil` fois la valeur de référence.
+
+Usage :
+    python benchmark.py --sortie bench.json
+    python benchmark.py --tailles 1000 10000 --reference bench.json --seuil 1.5
+"""
+import argparse
+import json
+import math
+import platform
+import struct
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from formats import lire_parcours
+from utils import (
+    calculate_deniv,
+    compute_cumulative_time,
+    compute_cumulative_time_strava,
+    compute_paces,
+    compute_paces_strava,
+    process_gpx,
+    trouver_vitesse_plate,
+)
+
+TAILLES = (1_000, 10_000, 100_000, 1_000_000)
+RELIEFS = {"plat": 0.0, "vallonne": 30.0, "montagneux": 150.0, "tres_montagneux": 400.0}  # amplitude (m)
+PAS_POINTS = 5.0  # mètres entre 2 points de la trace (montre à ~1 Hz)
+ALLURE_CIBLE = 420  # s/km pour le temps espéré des solveurs
+
+
+def generer_trace(n_points, amplitude, graine=0):
+    """Trace synthétique (lats, lons, eles) : marche aléatoire lissée et relief sinusoïdal bruité."""
+    rng = np.random.default_rng(graine)
+    cap = np.cumsum(rng.normal(0, 0.05, n_points))
+    pas_deg = PAS_POINTS / 111_319.5
+    lats = 45.0 + np.cumsum(pas_deg * np.cos(cap))
+    lons = 6.0 + np.cumsum(pas_deg * np.sin(cap) / math.cos(math.radians(45.0)))
+    s = np.arange(n_points) * PAS_POINTS / 1000  # km
+    eles = 1000 + amplitude * (np.sin(s / 3) + 0.3 * np.sin(s * 1.7)) + rng.normal(0, 1, n_points)
+    return lats, lons, eles
+
+
+def generer_gpx(n_points, amplitude, graine=0):
+    """Trace GPX synthétique (bytes), voir generer_trace."""
+    return vers_gpx(*generer_trace(n_points, amplitude, graine))
+
+
+def vers_gpx(lats, lons, eles):
+    """Trace au format GPX (bytes)."""
+    lignes = ['<?xml version="1.0" encoding="UTF-8"?>',
+              '<gpx version="1.1" creator="benchmark" xmlns="http://www.topografix.com/GPX/1/1">',
+              "<trk><trkseg>"]
+    lignes += [f'<trkpt lat="{la:.7f}" lon="{lo:.7f}"><ele>{e:.1f}</ele></trkpt>'
+               for la, lo, e in zip(lats.tolist(), lons.tolist(), eles.tolist())]
+    lignes.append("</trkseg></trk></gpx>")
+    return "\n".join(lignes).encode()
+
+
+def vers_tcx(lats, lons, eles):
+    """Trace au format TCX (bytes)."""
+    lignes = ['<?xml version="1.0" encoding="UTF-8"?>',
+              '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">',
+              "<Courses><Course><Name>benchmark</Name><Track>"]
+    lignes += [f"<Trackpoint><Position><LatitudeDegrees>{la:.7f}</LatitudeDegrees>"
+               f"<LongitudeDegrees>{lo:.7f}</LongitudeDegrees></Position>"
+               f"<AltitudeMeters>{e:.1f}</AltitudeMeters></Trackpoint>"
+               for la, lo, e in zip(lats.tolist(), lons.tolist(), eles.tolist())]
+    lignes.append("</Track></Course></Courses></TrainingCenterDatabase>")
+    return "\n".join(lignes).encode()
+
+
+def vers_geojson(lats, lons, eles):
+    """Trace au format GeoJSON (bytes) : une Feature LineString."""
+    coordonnees = np.round(np.column_stack((lons, lats, eles)), 7).tolist()
+    return json.dumps({"type": "Feature", "properties": {"name": "benchmark"},
+                       "geometry": {"type": "LineString", "coordinates": coordonnees}}).encode()
+
+
+def vers_fit(lats, lons, eles):
+    """Trace au format FIT (bytes) : une définition puis un message "record" par point (CRC à 0)."""
+    record = np.dtype([("entete", "u1"), ("timestamp", "<u4"), ("lat", "<i4"), ("lon", "<i4"), ("altitude", "<u2")])
+    definition = struct.pack("<BBBHB", 0x40, 0, 0, 20, 4) + bytes([253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85, 2, 2, 0x84])
+    messages = np.zeros(len(lats), dtype=record)
+    messages["timestamp"] = 1_000_000_000 + np.arange(len(lats))
+    messages["lat"] = np.round(np.asarray(lats) * 2**31 / 180)
+    messages["lon"] = np.round(np.asarray(lons) * 2**31 / 180)
+    messages["altitude"] = np.round((np.asarray(eles) + 500) * 5)
+    donnees = definition + messages.tobytes()
+    entete = struct.pack("<BBHI4sH", 14, 0x20, 2132, len(donnees), b".FIT", 0)
+    return entete + donnees + b"\0\0"
+
+
+FORMATS = {"gpx": vers_gpx, "tcx": vers_tcx, "fit": vers_fit, "geojson": vers_geojson}
+
+
+def mesurer(fonction, repetitions):
+    """(meilleur temps en s, pic mémoire en octets, résultat) d'un appel sans argument."""
+    meilleur = math.inf
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    tracemalloc.start()
+    fonction()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return meilleur, pic, resultat
+
+
+def lancer(tailles=TAILLES, reliefs=tuple(RELIEFS), repetitions=3):
+    """Liste des mesures (dict) pour chaque taille, relief et fonction."""
+    resultats = []
+    for n in tailles:
+        for relief in reliefs:
+            trace = generer_trace(n, RELIEFS[relief])
+            gpx = vers_gpx(*trace)
+            rep = 1 if n >= 1_000_000 else repetitions
+
+            def noter(nom, fonction, **extra):
+                temps, pic, resultat = mesurer(fonction, rep)
+                resultats.append({"taille": n, "relief": relief, "fonction": nom,
+                                  "temps_s": temps, "memoire_pic_octets": pic, **extra})
+                print(f"{n:>9} {relief:<16} {nom:<32} {temps*1000:10.2f} ms {pic/1024**2:8.1f} Mo",
+                      file=sys.stderr)
+                return resultat
+
+            distances, elevations, _, _ = noter("process_gpx", lambda: process_gpx(gpx))
+            for format, ecrire in FORMATS.items():
+                contenu = gpx if format == "gpx" else ecrire(*trace)
+                noter(f"lecture_{format}", lambda: lire_parcours(contenu), octets=len(contenu))
+            noter("calculate_deniv", lambda: calculate_deniv(elevations))
+            temps_espere = distances[-1] * ALLURE_CIBLE
+            vitesses = {}  # VAP de chaque modèle, pour mesurer ses temps cumulés et allures
+            for nom, model in (("trouver_vitesse_plate", "minetti"), ("trouver_vitesse_plate_strava", "strava")):
+                r = noter(nom, lambda: trouver_vitesse_plate(distances, elevations, temps_espere, model=model,
+                                                             details=True))
+                resultats[-1].update(evaluations=r.evaluations, iterations=r.iterations, methode=r.methode)
+                vitesses[model] = r.vitesse
+            noter("compute_cumulative_time",
+                  lambda: compute_cumulative_time(vitesses["minetti"], distances, elevations))
+            noter("compute_cumulative_time_strava",
+                  lambda: compute_cumulative_time_strava(vitesses["strava"], distances, elevations))
+            noter("compute_paces", lambda: compute_paces(distances, elevations, vitesses["minetti"]))
+            noter("compute_paces_strava", lambda: compute_paces_strava(distances, elevations, vitesses["strava"]))
+    return resultats
+
+
+def comparer(resultats, reference, seuil):
+    """Mesures dépassant `seuil` fois la référence (temps ou mémoire)."""
+    ref = {(r["taille"], r["relief"], r["fonction"]): r for r in reference["resultats"]}
+    regressions = []
+    for r in resultats:
+        ancien = ref.get((r["taille"], r["relief"], r["fonction"]))
+        if ancien is None:
+            continue
+        for cle in ("temps_s", "memoire_pic_octets"):
+            if ancien[cle] > 0 and r[cle] > seuil * ancien[cle]:
+                regressions.append(f"{r['fonction']} ({r['taille']}, {r['relief']}) : "
+                                   f"{cle} {r[cle]:.4g} > {seuil} x {ancien[cle]:.4g}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tailles", type=int, nargs="+", default=list(TAILLES))
+    parser.add_argument("--reliefs", nargs="+", default=list(RELIEFS), choices=list(RELIEFS))
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--sortie", default="benchmark.json")
+    parser.add_argument("--reference", help="JSON d'un run précédent à comparer")
+    parser.add_argument("--seuil", type=float, default=1.5, help="ratio maximal toléré / référence")
+    args = parser.parse_args(argv)
+
+    resultats = lancer(args.tailles, args.reliefs, args.repetitions)
+    rapport = {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "resultats": resultats,
+    }
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2)
+
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f), args.seuil)
+        for ligne in regressions:
+            print("RÉGRESSION", ligne, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
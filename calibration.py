@@ -0,0 +1,340 @@
+"""
+Calibrage d'une courbe de coût personnelle à partir d'activités enregistrées.
+
+approximation_courbe_modele_strava.py ajuste un polynôme sur des points relevés à la main ;
+ici, les points viennent des activités horodatées d'un coureur (GPX, TCX, FIT ou GeoJSON,
+voir formats.lire_activite) :
+    1. chaque activité est découpée en tronçons d'environ LONGUEUR_TRONCON mètres (altitude
+       lissée) ; les tronçons à l'arrêt ou aberrants (vitesse hors [VITESSE_MIN, VITESSE_MAX])
+       sont écartés ;
+    2. les tronçons sont regroupés par classe de pente (np.bincount) : mètres, secondes et
+       "secondes à plat" (secondes x vitesse sur plat de l'activité, pour comparer des sorties
+       faites à des allures différentes) ;
+    3. les histogrammes des activités s'additionnent (HistogrammeEffort) : l'historique est
+       sauvé en .npz et les nouvelles activités y sont ajoutées sans relire les anciennes
+       (mettre_a_jour, les activités déjà vues sont reconnues au hash de leur contenu) ;
+    4. le rapport d'allure pente / plat de chaque classe est ajusté par un polynôme ou une
+       spline cubique, pondérés par la distance de la classe. Le modèle obtenu est un
+       ModeleCout (models.py) : après enregistrer_modele, model="perso" dans utils.py.
+
+Usage :
+    python calibration.py activites/ --historique perso.npz --nom perso
+    python calibration.py nouvelles/ --historique perso.npz --methode spline --graphe
+"""
+import argparse
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from formats import EXTENSIONS, lire_activite
+from gpx_stream import decimer, distances_segments
+from models import PENTE_MAX_TABLE, PENTE_MIN_TABLE, ModeleCout, enregistrer_modele
+from slope_index import PAS_PENTE
+from smoothing import FENETRE_LISSAGE, lisser
+from utils import segment_arrays
+
+LONGUEUR_TRONCON = 50.0  # mètres : longueur minimale d'un tronçon (pente peu bruitée)
+VITESSE_MIN = 0.2  # m/s : en dessous, le tronçon contient un arrêt
+VITESSE_MAX = 8.0  # m/s : au-dessus, erreur GPS (ou trajet hors course)
+PENTE_PLAT = 2.0  # % : tronçons utilisés pour la vitesse sur plat de l'activité
+DISTANCE_PLAT_MIN = 500.0  # mètres de plat nécessaires pour normaliser une activité
+METRES_MIN = 200.0  # distance minimale d'une classe de pente pour l'ajustement
+DEGRE = 3
+NOEUDS = (-30.0, -20.0, -10.0, 0.0, 10.0, 20.0, 30.0)  # % : noeuds de la spline (dans les données)
+
+
+@dataclass
+class HistogrammeEffort:
+    pas: float  # largeur des classes de pente en %
+    classes: np.ndarray  # (K,) numéros des classes (pente ~ classe * pas), croissants
+    metres: np.ndarray  # (K,) distance parcourue dans chaque classe
+    secondes: np.ndarray  # (K,) temps passé dans chaque classe
+    metres_pente: np.ndarray  # (K,) somme longueur x pente (pente moyenne de la classe)
+    secondes_plat: np.ndarray  # (K,) somme temps x vitesse sur plat de l'activité (m)
+    activites: np.ndarray  # identifiants (SHA-256 du contenu) des activités intégrées
+
+    @classmethod
+    def vide(cls, pas=PAS_PENTE):
+        zeros = np.zeros(0)
+        return cls(float(pas), np.zeros(0, dtype=np.int64), zeros, zeros, zeros, zeros, np.zeros(0, dtype=str))
+
+    @property
+    def pentes(self):
+        """Pente moyenne (%) de chaque classe."""
+        return self.metres_pente / self.metres
+
+    @property
+    def rapports_allure(self):
+        """Allure dans la classe / allure sur plat (1 à plat, > 1 en montée raide)."""
+        return self.secondes_plat / self.metres
+
+    def ajouter(self, autre):
+        """Somme de deux histogrammes (même pas de pente)."""
+        if autre.pas != self.pas:
+            raise ValueError(f"Pas de pente différents : {self.pas} et {autre.pas}")
+        classes = np.union1d(self.classes, autre.classes)
+        cumuls = []
+        for nom in ("metres", "secondes", "metres_pente", "secondes_plat"):
+            total = np.zeros(len(classes))
+            for h in (self, autre):
+                total[np.searchsorted(classes, h.classes)] += getattr(h, nom)
+            cumuls.append(total)
+        return HistogrammeEffort(self.pas, classes, *cumuls, np.concatenate((self.activites, autre.activites)))
+
+    def sauver(self, chemin):
+        with open(chemin, "wb") as f:
+            np.savez(f, pas=self.pas, classes=self.classes, metres=self.metres, secondes=self.secondes,
+                     metres_pente=self.metres_pente, secondes_plat=self.secondes_plat, activites=self.activites)
+
+    @classmethod
+    def charger(cls, chemin):
+        with np.load(chemin) as npz:
+            return cls(float(npz["pas"]), npz["classes"], npz["metres"], npz["secondes"],
+                       npz["metres_pente"], npz["secondes_plat"], npz["activites"])
+
+
+def troncons_activite(activite, longueur=LONGUEUR_TRONCON, lissage="gaussien", fenetre=FENETRE_LISSAGE):
+    """
+    Tronçons d'une activité (voir formats.lire_activite).
+
+    Returns:
+        tuple(np.ndarray, np.ndarray, np.ndarray): longueurs (m), pentes (%) et durées (s)
+        des tronçons retenus.
+    """
+    lats, lons, eles, temps = activite["lats"], activite["lons"], activite["eles"], activite["temps"]
+    valides = ~(np.isnan(eles) | np.isnan(temps))
+    lats, lons, eles, temps = lats[valides], lons[valides], eles[valides], temps[valides]
+    if len(lats) < 2:
+        raise ValueError("pas de points horodatés avec altitude")
+    cumul = np.zeros(len(lats))
+    np.cumsum(distances_segments(lats, lons, eles), out=cumul[1:])
+    eles = lisser(cumul / 1000, eles, lissage, fenetre)
+    retenus = decimer(cumul, longueur)
+    d, slopes = segment_arrays(cumul[retenus] / 1000, eles[retenus])
+    dt = np.diff(temps[retenus])
+    vitesses = np.zeros_like(d)
+    np.divide(d, dt, out=vitesses, where=dt > 0)
+    gardes = (vitesses >= VITESSE_MIN) & (vitesses <= VITESSE_MAX)
+    return d[gardes], slopes[gardes], dt[gardes]
+
+
+def histogramme_activite(source, pas=PAS_PENTE, identifiant="", **options):
+    """
+    Histogramme par classe de pente d'une activité.
+
+    Args:
+        source (bytes, str ou fichier): activité horodatée, tout format (voir formats.py).
+        pas (float): largeur des classes de pente en %.
+        identifiant (str): identifiant de l'activité (voir HistogrammeEffort.activites).
+        **options: longueur, lissage, fenetre (voir troncons_activite).
+
+    Returns:
+        HistogrammeEffort
+    """
+    d, slopes, dt = troncons_activite(lire_activite(source), **options)
+    plat = np.abs(slopes) <= PENTE_PLAT
+    if d[plat].sum() < DISTANCE_PLAT_MIN:
+        raise ValueError(f"moins de {DISTANCE_PLAT_MIN:.0f} m de plat : vitesse de référence inconnue")
+    v_plat = d[plat].sum() / dt[plat].sum()
+    numeros = np.floor(slopes / pas + 0.5).astype(np.int64)
+    classes, classe = np.unique(numeros, return_inverse=True)
+    k = len(classes)
+    return HistogrammeEffort(
+        float(pas), classes,
+        np.bincount(classe, weights=d, minlength=k),
+        np.bincount(classe, weights=dt, minlength=k),
+        np.bincount(classe, weights=d * slopes, minlength=k),
+        np.bincount(classe, weights=dt * v_plat, minlength=k),
+        np.array([identifiant], dtype=str),
+    )
+
+
+def _traiter(chemin, connues, pas, options):
+    """(histogramme ou None, erreur) pour un fichier ; None sans erreur si l'activité est déjà connue."""
+    try:
+        with open(chemin, "rb") as f:
+            contenu = f.read()
+        identifiant = hashlib.sha256(contenu).hexdigest()
+        if identifiant in connues:
+            return None, ""
+        return histogramme_activite(contenu, pas, identifiant, **options), ""
+    except Exception as e:  # fichier corrompu, activité sans horodatage...
+        return None, f"{type(e).__name__}: {e}"
+
+
+def mettre_a_jour(histogramme, chemins, processus=os.cpu_count(), pas=PAS_PENTE, **options):
+    """
+    Ajoute des activités à un historique, en parallèle.
+
+    Args:
+        histogramme (HistogrammeEffort or None): historique existant (None : nouveau).
+        chemins (list of str): fichiers d'activités ; ceux déjà intégrés sont ignorés.
+        processus (int): taille du pool (1 : dans le processus courant).
+        pas (float): largeur des classes d'un nouvel historique.
+        **options: voir troncons_activite.
+
+    Returns:
+        tuple(HistogrammeEffort, int, dict): historique mis à jour, nombre d'activités
+        ajoutées et erreurs {chemin: message}.
+    """
+    histogramme = histogramme if histogramme is not None else HistogrammeEffort.vide(pas)
+    connues = frozenset(histogramme.activites.tolist())
+    args = [(chemin, connues, histogramme.pas, options) for chemin in chemins]
+    if processus > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=processus) as pool:
+            resultats = list(pool.map(_traiter, *zip(*args)))
+    else:
+        resultats = [_traiter(*a) for a in args]
+
+    ajoutees = 0
+    erreurs = {}
+    for chemin, (h, erreur) in zip(chemins, resultats):
+        if erreur:
+            erreurs[chemin] = erreur
+        elif h is not None and h.activites[0] not in histogramme.activites:  # doublons du même lot
+            histogramme = histogramme.ajouter(h)
+            ajoutees += 1
+    return histogramme, ajoutees, erreurs
+
+
+class SplineCout:
+    """Spline cubique (base des puissances tronquées), prolongée linéairement hors des données."""
+
+    def __init__(self, noeuds, coeffs, bornes):
+        self.noeuds = np.asarray(noeuds, dtype=float)
+        self.coeffs = np.asarray(coeffs, dtype=float)
+        self.bornes = bornes
+
+    @staticmethod
+    def base(i, noeuds):
+        i = np.asarray(i, dtype=float)[..., None]
+        return np.concatenate((i ** np.arange(4), np.maximum(i - noeuds, 0) ** 3), axis=-1)
+
+    def _derivee(self, i):
+        puissances = np.array([0.0, 1.0, 2 * i, 3 * i**2])
+        tronquees = 3 * np.maximum(i - self.noeuds, 0) ** 2
+        return float(np.concatenate((puissances, tronquees)) @ self.coeffs)
+
+    def __call__(self, i):
+        i = np.asarray(i, dtype=float)
+        bas, haut = self.bornes
+        cout = self.base(np.clip(i, bas, haut), self.noeuds) @ self.coeffs
+        cout = np.where(i < bas, cout + (i - bas) * self._derivee(bas), cout)
+        return np.where(i > haut, cout + (i - haut) * self._derivee(haut), cout)
+
+
+def ajuster_modele(histogramme, nom="perso", methode="polynome", degre=DEGRE, noeuds=NOEUDS,
+                   metres_min=METRES_MIN, plafond=None, vitesse_max=None):
+    """
+    Modèle de coût ajusté sur un historique.
+
+    Args:
+        histogramme (HistogrammeEffort): historique des activités.
+        nom (str): nom du modèle (registre de models.py).
+        methode (str): "polynome" (np.polyfit pondéré, degré `degre`) ou "spline"
+            (spline cubique aux noeuds `noeuds`, en %, moindres carrés pondérés).
+        metres_min (float): les classes moins parcourues sont ignorées.
+        plafond, vitesse_max: voir ModeleCout.
+
+    Returns:
+        ModeleCout (à enregistrer avec models.enregistrer_modele).
+    """
+    gardes = histogramme.metres >= metres_min
+    i = histogramme.pentes[gardes] / 100
+    rapports = histogramme.rapports_allure[gardes]
+    poids = np.sqrt(histogramme.metres[gardes])  # écart-type du rapport ~ 1 / sqrt(distance)
+
+    if methode == "polynome":
+        if len(i) <= degre:
+            raise ValueError(f"{len(i)} classes de pente avec assez de distance pour un polynôme de degré {degre}")
+        coeffs = np.polyfit(i, rapports, degre, w=poids)
+        modele = ModeleCout.depuis_polynome(nom, coeffs, plafond=plafond, vitesse_max=vitesse_max)
+    elif methode == "spline":
+        noeuds = np.asarray(noeuds, dtype=float) / 100
+        noeuds = noeuds[(noeuds > i.min()) & (noeuds < i.max())] if len(i) else noeuds[:0]
+        if len(i) <= 4 + len(noeuds):
+            raise ValueError(f"{len(i)} classes de pente avec assez de distance pour la spline")
+        coeffs = np.linalg.lstsq(SplineCout.base(i, noeuds) * poids[:, None], rapports * poids, rcond=None)[0]
+        modele = ModeleCout(nom, SplineCout(noeuds, coeffs, (float(i.min()), float(i.max()))),
+                            plafond=plafond, vitesse_max=vitesse_max)
+    else:
+        raise ValueError(f"Méthode d'ajustement inconnue : {methode}")
+
+    # le modèle est compilé en table sur [PENTE_MIN_TABLE, PENTE_MAX_TABLE] (voir models.py) :
+    # la courbe doit rester positive sur toute la table, pas seulement sur les pentes observées
+    grille = np.linspace(min(PENTE_MIN_TABLE / 100, i.min()), max(PENTE_MAX_TABLE / 100, i.max()), 1001)
+    if not np.all(modele.cout(grille) > 0):
+        raise ValueError(f"La courbe ajustée n'est pas positive entre {PENTE_MIN_TABLE:.0f} et "
+                         f"{PENTE_MAX_TABLE:.0f} % (essayer un degré plus faible ou la spline)")
+    return modele
+
+
+def modele_depuis_historique(chemin, nom="perso", **options):
+    """Ajuste et enregistre (models.enregistrer_modele) le modèle d'un historique .npz."""
+    return enregistrer_modele(ajuster_modele(HistogrammeEffort.charger(chemin), nom, **options))
+
+
+def tracer(histogramme, modele, metres_min=METRES_MIN):
+    """Rapports d'allure observés et courbe ajustée (matplotlib)."""
+    import matplotlib.pyplot as plt
+
+    gardes = histogramme.metres >= metres_min
+    pentes = histogramme.pentes[gardes]
+    lisse = np.linspace(pentes.min(), pentes.max(), 300)
+    plt.figure(figsize=(8, 5))
+    plt.scatter(pentes, histogramme.rapports_allure[gardes], s=4 + 40 * histogramme.metres[gardes]
+                / histogramme.metres[gardes].max(), label="Activités (taille : distance)")
+    plt.plot(lisse, modele.cout(lisse / 100) / modele.cout(0), "-", label=f"Modèle {modele.nom}")
+    plt.xlabel("Pente (%)")
+    plt.ylabel("Allure / allure sur plat")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("chemins", nargs="+", help="fichiers d'activités ou dossiers")
+    parser.add_argument("--historique", help="historique .npz à compléter (créé s'il n'existe pas)")
+    parser.add_argument("--nom", default="perso")
+    parser.add_argument("--methode", choices=["polynome", "spline"], default="polynome")
+    parser.add_argument("--degre", type=int, default=DEGRE)
+    parser.add_argument("--pas", type=float, default=PAS_PENTE, help="largeur des classes de pente (%%)")
+    parser.add_argument("-j", "--processus", type=int, default=os.cpu_count(), help="taille du pool")
+    parser.add_argument("--graphe", action="store_true", help="affiche les points et la courbe ajustée")
+    args = parser.parse_args(argv)
+
+    chemins = []
+    for chemin in args.chemins:
+        if os.path.isdir(chemin):
+            chemins += sorted(os.path.join(chemin, f) for f in os.listdir(chemin) if f.lower().endswith(EXTENSIONS))
+        else:
+            chemins.append(chemin)
+
+    historique = None
+    if args.historique and os.path.exists(args.historique):
+        historique = HistogrammeEffort.charger(args.historique)
+    historique, ajoutees, erreurs = mettre_a_jour(historique, chemins, args.processus, args.pas)
+    for chemin, erreur in erreurs.items():
+        print(f"{os.path.basename(chemin)} : {erreur}", file=sys.stderr)
+    print(f"{ajoutees} activité(s) ajoutée(s), {len(historique.activites)} au total, "
+          f"{historique.metres.sum() / 1000:.1f} km", file=sys.stderr)
+    if args.historique:
+        historique.sauver(args.historique)
+
+    modele = ajuster_modele(historique, args.nom, args.methode, args.degre)
+    if modele.coeffs is not None:
+        print("Coefficients du polynôme (degré décroissant) :", list(modele.coeffs))
+    else:
+        for pente, rapport in zip((-30, -20, -10, 0, 10, 20, 30), modele.cout(np.arange(-30, 31, 10) / 100)):
+            print(f"{pente:+4d} % : {rapport / modele.cout(0):.3f} x allure sur plat")
+    if args.graphe:
+        tracer(historique, modele)
+
+
+if __name__ == "__main__":
+    main()
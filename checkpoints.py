@@ -0,0 +1,136 @@
+"""
+Points de passage (ravitaillements, contrôles) à partir des waypoints <wpt> du GPX.
+
+Chaque waypoint est calé sur la trace par une recherche vectorisée du point le plus proche
+(matrice waypoints x points de la trace, par blocs pour borner la mémoire), ce qui donne sa
+distance le long du parcours. Sur un aller-retour ou une boucle, un waypoint est proche de
+plusieurs passages : on retient le premier passage après celui du point précédent (les
+waypoints d'un GPX de course sont dans l'ordre de la course), sinon le plus proche. Deux
+waypoints au même endroit (départ et arrivée d'une boucle, ravitaillement utilisé à l'aller
+et au retour) tombent ainsi sur deux passages distincts.
+Les temps de passage sont ensuite interpolés dans les temps cumulés par searchsorted, pour
+tous les modèles et temps espérés d'un coup, sans reparcourir la trace par point de passage.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from batch import plan_allures
+from geometry import projeter
+
+DISTANCE_MAX_CALAGE = 200.0  # mètres : au-delà, le waypoint n'est pas sur le parcours
+MARGE_PASSAGE = 25.0  # mètres : tolérance pour préférer un passage antérieur au plus proche
+MEMOIRE_MAX = 64 * 1024**2  # octets pour un bloc de la matrice des distances
+
+
+@dataclass
+class PointsPassage:
+    noms: np.ndarray  # noms des waypoints
+    distances: np.ndarray  # km le long du parcours, croissantes
+    ecarts: np.ndarray  # distance en mètres entre le waypoint et la trace
+
+
+def caler_waypoints(wpt_lats, wpt_lons, lats, lons, distances_trace, noms=None,
+                    distance_max=DISTANCE_MAX_CALAGE, ordonne=True, memoire_max=MEMOIRE_MAX):
+    """
+    Cale les waypoints sur la trace.
+
+    Args:
+        wpt_lats, wpt_lons (array of float): coordonnées des waypoints.
+        lats, lons (array of float): coordonnées de tous les points de la trace.
+        distances_trace (array of float): distances cumulées (km) des points de la trace.
+        noms (array of str, optional): noms des waypoints.
+        distance_max (float): les waypoints plus loin de la trace (m) sont ignorés.
+        ordonne (bool): les waypoints sont dans l'ordre de la course (voir l'en-tête).
+        memoire_max (int): taille maximale en octets d'un bloc de la matrice des distances.
+
+    Returns:
+        PointsPassage: points retenus, triés par distance.
+    """
+    wpt_lats = np.asarray(wpt_lats, dtype=float)
+    n_wpt, n = len(wpt_lats), len(lats)
+    noms = np.asarray(noms if noms is not None else [f"Point {k + 1}" for k in range(n_wpt)], dtype=str)
+    if n_wpt == 0 or n == 0:
+        return PointsPassage(noms[:0], np.zeros(0), np.zeros(0))
+
+    # même projection pour les waypoints et la trace
+    x, y = projeter(np.concatenate((wpt_lats, lats)), np.concatenate((wpt_lons, lons)))
+    wx, wy, x, y = x[:n_wpt], y[:n_wpt], x[n_wpt:], y[n_wpt:]
+
+    indices = np.zeros(n_wpt, dtype=np.intp)
+    ecarts = np.zeros(n_wpt)
+    curseur = 0  # début de la recherche : sortie du passage du dernier waypoint retenu
+    taille_bloc = max(1, memoire_max // (8 * n))
+    for debut in range(0, n_wpt, taille_bloc):
+        bloc = slice(debut, debut + taille_bloc)
+        d = np.hypot(x[None, :] - wx[bloc, None], y[None, :] - wy[bloc, None])
+        plus_proches = d.argmin(axis=1)
+        for k, ligne in enumerate(d, start=debut):
+            j = plus_proches[k - debut]
+            if ordonne and curseur < n:
+                suite = ligne[curseur:]
+                seuil = ligne[j] + MARGE_PASSAGE
+                proches = np.flatnonzero(suite <= seuil)
+                if not len(proches) and suite.min() <= distance_max:
+                    # la trace ne repasse pas aussi près : passage le plus proche après le curseur
+                    seuil = suite.min() + MARGE_PASSAGE
+                    proches = np.flatnonzero(suite <= seuil)
+                if len(proches):
+                    # premier passage après le curseur : de son entrée sous le seuil
+                    # à sa sortie, on garde le point le plus proche
+                    entree = proches[0]
+                    sortie = np.flatnonzero(suite[entree:] > seuil)
+                    fin = entree + sortie[0] if len(sortie) else len(suite)
+                    j = curseur + entree + int(suite[entree:fin].argmin())
+                    if ligne[j] <= distance_max:  # un waypoint écarté ne déplace pas le curseur
+                        curseur += fin
+            indices[k] = j
+            ecarts[k] = ligne[j]
+
+    retenus = ecarts <= distance_max
+    distances = np.asarray(distances_trace, dtype=float)[indices[retenus]]
+    ordre = np.argsort(distances, kind="stable")
+    return PointsPassage(noms[retenus][ordre], distances[ordre], ecarts[retenus][ordre])
+
+
+def points_passage(parcours, **kwargs):
+    """Points de passage d'un parcours lu par gpx_stream.lire_parcours (ou CacheParcours.charger_parcours)."""
+    return caler_waypoints(parcours["wpt_lats"], parcours["wpt_lons"], parcours["lats"], parcours["lons"],
+                           parcours["distances_trace"], parcours["wpt_noms"], **kwargs)
+
+
+def temps_aux_distances(km, distances, temps_cumules):
+    """
+    Interpolation linéaire des temps cumulés aux distances km.
+
+    Args:
+        km (array of float): distances des points de passage (km).
+        distances (array of float): distances cumulées des points du parcours (km).
+        temps_cumules (array): temps cumulés (s), dernière dimension alignée sur distances
+            (par exemple (modèles, temps espérés, points)).
+
+    Returns:
+        np.ndarray: temps de passage, forme temps_cumules.shape[:-1] + (len(km),).
+    """
+    distances = np.asarray(distances, dtype=float)
+    temps_cumules = np.asarray(temps_cumules, dtype=float)
+    km = np.clip(np.asarray(km, dtype=float), distances[0], distances[-1])
+    if len(distances) < 2:
+        return np.zeros(temps_cumules.shape[:-1] + km.shape)
+    j = np.clip(np.searchsorted(distances, km, side="right"), 1, len(distances) - 1)
+    d0, d1 = distances[j - 1], distances[j]
+    poids = np.zeros_like(km)
+    np.divide(km - d0, d1 - d0, out=poids, where=d1 > d0)
+    t0, t1 = temps_cumules[..., j - 1], temps_cumules[..., j]
+    return t0 + poids * (t1 - t0)
+
+
+def tableau_passages(points, distances, elevations, temps_espere, models=("minetti", "strava")):
+    """
+    Temps de passage à chaque point pour chaque (modèle, temps espéré).
+
+    Returns:
+        np.ndarray: (n_modeles, n_temps, n_points_passage) en secondes.
+    """
+    plan = plan_allures(distances, elevations, temps_espere, models)
+    return temps_aux_distances(points.distances, distances, plan.temps_cumules)
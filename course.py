@@ -0,0 +1,108 @@
+"""
+Parcours stocké dans des tableaux numpy contigus.
+
+Deux blocs, car la trace GPS garde tous les points alors que le profil est décimé :
+    - profil (2, n) : distances cumulées (km) et altitudes (m) des points retenus ;
+    - trace (2, m) : latitudes et longitudes de tous les points (carte, export).
+Chaque série est une ligne contiguë d'un bloc, sans objet Python par point (8 ou 4 octets
+par valeur au lieu de ~50 à 80 pour une liste de floats ou de tuples). En float32, la
+résolution reste sous le mètre pour les coordonnées et sous le centimètre pour les
+distances d'un parcours de quelques centaines de km.
+
+sauver() écrit chaque bloc au format .npy dans un dossier ; charger() les relit en
+mémoire partagée (np.memmap, sans copie). vers_listes() donne les listes renvoyées
+historiquement par utils.process_gpx pour les fonctions qui travaillent sur des listes.
+"""
+import os
+
+import numpy as np
+
+from formats import lire_fichier
+from gpx_stream import DISTANCE_MIN
+
+
+def _bloc(series, dtype):
+    bloc = np.empty((len(series), len(series[0])), dtype=dtype)
+    for ligne, serie in zip(bloc, series):
+        ligne[:] = serie
+    return bloc
+
+
+class Course:
+    """Profil (distances en km, altitudes en m) et trace GPS (latitudes, longitudes) d'un parcours."""
+
+    __slots__ = ("profil", "trace")
+
+    def __init__(self, distances, elevations, lats, lons, float32=False):
+        dtype = np.float32 if float32 else np.float64
+        self.profil = _bloc((distances, elevations), dtype)
+        self.trace = _bloc((lats, lons), dtype)
+
+    @classmethod
+    def depuis_blocs(cls, profil, trace):
+        """Course sur des blocs (2, n) et (2, m) existants, sans copie (ex. np.memmap)."""
+        for bloc in (profil, trace):
+            if bloc.ndim != 2 or bloc.shape[0] != 2:
+                raise ValueError(f"Bloc (2, n) attendu, reçu {bloc.shape}")
+        course = cls.__new__(cls)
+        course.profil = profil
+        course.trace = trace
+        return course
+
+    @classmethod
+    def depuis_fichier(cls, source, distance_min=DISTANCE_MIN, methode="gpxpy", float32=False, cache=None):
+        """Lit un GPX, TCX, FIT ou GeoJSON (voir formats.py), via `cache` (CacheParcours) s'il est fourni."""
+        lire = cache.lire_gpx if cache is not None else lire_fichier
+        return cls(*lire(source, distance_min, methode), float32=float32)
+
+    depuis_gpx = depuis_fichier  # ancien nom
+
+    distances = property(lambda self: self.profil[0], doc="Distances cumulées en km.")
+    elevations = property(lambda self: self.profil[1], doc="Altitudes en mètres.")
+    lats = property(lambda self: self.trace[0], doc="Latitudes en degrés.")
+    lons = property(lambda self: self.trace[1], doc="Longitudes en degrés.")
+
+    @property
+    def distances_pace(self):
+        """Distance au milieu de chaque segment (km), abscisse des allures."""
+        return (self.distances[1:] + self.distances[:-1]) / 2
+
+    @property
+    def nbytes(self):
+        return self.profil.nbytes + self.trace.nbytes
+
+    def __len__(self):
+        return self.profil.shape[1]
+
+    def __repr__(self):
+        distance = float(self.distances[-1]) if len(self) else 0.0
+        return (f"Course({len(self)} points de profil, {self.trace.shape[1]} points de trace, "
+                f"{distance:.2f} km, {self.profil.dtype})")
+
+    def avec_altitudes(self, elevations):
+        """Parcours avec d'autres altitudes (ex. lissées) ; la trace est partagée."""
+        profil = self.profil.copy()
+        profil[1] = elevations
+        return Course.depuis_blocs(profil, self.trace)
+
+    def astype(self, dtype):
+        return Course.depuis_blocs(self.profil.astype(dtype), self.trace.astype(dtype))
+
+    def sauver(self, dossier):
+        """Écrit profil.npy et trace.npy dans `dossier` (relisibles sans copie par charger())."""
+        os.makedirs(dossier, exist_ok=True)
+        for nom in self.__slots__:
+            with open(os.path.join(dossier, nom + ".npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(getattr(self, nom)))
+
+    @classmethod
+    def charger(cls, dossier, mmap=True):
+        """Relit un parcours écrit par sauver() ; avec mmap, les données restent sur disque (lecture seule)."""
+        mode = "r" if mmap else None
+        return cls.depuis_blocs(*(np.load(os.path.join(dossier, nom + ".npy"), mmap_mode=mode)
+                                  for nom in cls.__slots__))
+
+    def vers_listes(self):
+        """(distances, elevations, distances_pace, coords) en listes Python, comme process_gpx."""
+        coords = list(zip(self.lats.tolist(), self.lons.tolist()))
+        return self.distances.tolist(), self.elevations.tolist(), self.distances_pace.tolist(), coords
@@ -0,0 +1,198 @@
+"""
+Cache des parcours analysés, adressé par le contenu du fichier.
+
+La clé est un hash SHA-256 des octets du fichier (GPX, TCX, FIT ou GeoJSON, voir formats.py) et des paramètres de lecture : le même fichier
+de course chargé par plusieurs utilisateurs, ou relu à chaque rerun de Streamlit, n'est
+analysé qu'une fois. Deux niveaux :
+    - une LRU en mémoire (nombre d'entrées limité) devant
+    - un dossier de fichiers .npz non compressés, limité en taille ; les fichiers les moins
+      récemment utilisés (date de modification, mise à jour à chaque lecture) sont supprimés.
+Les compteurs de succès / échecs sont dans `stats`.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from geometry import importance_douglas_peucker
+from formats import lire_octets, lire_parcours
+from gpx_stream import DISTANCE_MIN
+from smoothing import FENETRE_LISSAGE, lisser
+
+VERSION_FORMAT = 3  # à incrémenter si le contenu des entrées change
+CACHE_DIR = os.environ.get("SIMULATEUR_CACHE_DIR",
+                           os.path.join(tempfile.gettempdir(), "simulateurtrail_cache"))
+TAILLE_MAX_DISQUE = 500 * 1024**2  # octets
+ENTREES_MEMOIRE = 32
+
+
+class CacheParcours:
+    """Cache LRU mémoire + disque de dictionnaires de tableaux numpy."""
+
+    def __init__(self, dossier=CACHE_DIR, taille_max_disque=TAILLE_MAX_DISQUE,
+                 entrees_memoire=ENTREES_MEMOIRE):
+        self.dossier = dossier
+        self.taille_max_disque = taille_max_disque
+        self.entrees_memoire = entrees_memoire
+        self._memoire = OrderedDict()
+        self._verrou = threading.Lock()
+        self.stats = {"hits_memoire": 0, "hits_disque": 0, "misses": 0}
+        if dossier is not None:
+            os.makedirs(dossier, exist_ok=True)
+
+    @staticmethod
+    def cle(contenu, **params):
+        """Clé de cache : hash du contenu et des paramètres (triés par nom)."""
+        h = hashlib.sha256()
+        h.update(contenu)
+        h.update(repr((VERSION_FORMAT, sorted(params.items()))).encode())
+        return h.hexdigest()
+
+    def _chemin(self, cle):
+        return os.path.join(self.dossier, cle + ".npz")
+
+    def _garder_en_memoire(self, cle, valeur):
+        with self._verrou:
+            self._memoire[cle] = valeur
+            self._memoire.move_to_end(cle)
+            while len(self._memoire) > self.entrees_memoire:
+                self._memoire.popitem(last=False)
+
+    def obtenir(self, cle, calcul):
+        """
+        Renvoie l'entrée `cle`, en la calculant avec `calcul()` si elle est absente.
+
+        Args:
+            cle (str): clé de cache (voir cle()).
+            calcul (callable): renvoie un dict {nom: np.ndarray}.
+
+        Returns:
+            dict: tableaux de l'entrée.
+        """
+        with self._verrou:
+            valeur = self._memoire.get(cle)
+            if valeur is not None:
+                self._memoire.move_to_end(cle)
+                self.stats["hits_memoire"] += 1
+                return valeur
+
+        if self.dossier is not None:
+            chemin = self._chemin(cle)
+            try:
+                with np.load(chemin) as npz:
+                    valeur = {nom: npz[nom] for nom in npz.files}
+                os.utime(chemin)  # marque l'entrée comme récemment utilisée
+            except (OSError, ValueError, EOFError, zipfile.BadZipFile):  # absent, tronqué ou corrompu
+                valeur = None
+            if valeur is not None:
+                with self._verrou:
+                    self.stats["hits_disque"] += 1
+                self._garder_en_memoire(cle, valeur)
+                return valeur
+
+        with self._verrou:
+            self.stats["misses"] += 1
+        valeur = calcul()
+        self._garder_en_memoire(cle, valeur)
+        if self.dossier is not None:
+            self._ecrire(cle, valeur)
+        return valeur
+
+    def _ecrire(self, cle, valeur):
+        # écriture atomique : fichier temporaire puis renommage
+        fd, tmp = tempfile.mkstemp(dir=self.dossier, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **valeur)
+            os.replace(tmp, self._chemin(cle))
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._limiter_disque()
+
+    def _limiter_disque(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale."""
+        entrees = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".npz"):
+                try:
+                    st = os.stat(os.path.join(self.dossier, nom))
+                except OSError:
+                    continue
+                entrees.append((st.st_mtime, st.st_size, nom))
+        total = sum(taille for _, taille, _ in entrees)
+        for _, taille, nom in sorted(entrees):
+            if total <= self.taille_max_disque:
+                break
+            try:
+                os.remove(os.path.join(self.dossier, nom))
+            except OSError:
+                pass
+            total -= taille
+
+    def charger_parcours(self, source, distance_min=DISTANCE_MIN, methode="gpxpy"):
+        """
+        Parcours analysé, en cache.
+
+        Returns:
+            dict: tableaux de formats.lire_parcours (profil, trace, waypoints) et
+            importance (Douglas-Peucker, voir geometry.py) des points de la trace.
+        """
+        contenu = lire_octets(source)
+        cle = self.cle_parcours(contenu, distance_min, methode)
+
+        def calcul():
+            v = lire_parcours(contenu, distance_min, methode)
+            v["importance"] = importance_douglas_peucker(v["lats"], v["lons"])
+            return v
+
+        return self.obtenir(cle, calcul)
+
+    def cle_parcours(self, source, distance_min=DISTANCE_MIN, methode="gpxpy"):
+        """Clé de l'entrée de charger_parcours() : identifiant du parcours (ex. service HTTP)."""
+        return self.cle(lire_octets(source), distance_min=distance_min, methode=methode)
+
+    def par_cle(self, cle):
+        """Entrée déjà en cache (mémoire ou disque) ; KeyError si elle est absente ou expirée."""
+        if not re.fullmatch(r"[0-9a-f]{64}", cle or ""):
+            raise KeyError(cle)
+
+        def absente():
+            raise KeyError(cle)
+
+        return self.obtenir(cle, absente)
+
+    def altitudes_lissees(self, source, lissage, fenetre=FENETRE_LISSAGE,
+                          distance_min=DISTANCE_MIN, methode="gpxpy"):
+        """Altitudes des points retenus lissées (voir smoothing.lisser), en cache."""
+        contenu = lire_octets(source)
+        cle = self.cle(contenu, distance_min=distance_min, methode=methode,
+                       lissage=lissage, fenetre=fenetre)
+
+        def calcul():
+            v = self.charger_parcours(contenu, distance_min, methode)
+            return {"elevations": lisser(v["distances"], v["elevations"], lissage, fenetre)}
+
+        return self.obtenir(cle, calcul)["elevations"]
+
+    def lire_gpx(self, source, distance_min=DISTANCE_MIN, methode="gpxpy"):
+        """Version en cache de formats.lire_fichier (mêmes arguments et résultats, tous formats)."""
+        v = self.charger_parcours(source, distance_min, methode)
+        return v["distances"], v["elevations"], v["lats"], v["lons"]
+
+
+_cache_defaut = None
+
+
+def cache_defaut():
+    """Cache partagé par le processus (persiste entre les reruns et les sessions Streamlit)."""
+    global _cache_defaut
+    if _cache_defaut is None:
+        _cache_defaut = CacheParcours()
+    return _cache_defaut
@@ -0,0 +1,82 @@
+"""
+Réduction du nombre de points envoyés aux graphiques Plotly.
+
+Les graphiques n'affichent qu'un budget de points : la forme des courbes est conservée par
+LTTB (Largest-Triangle-Three-Buckets) et les extrêmes locaux (sommets, creux, pics d'allure)
+par un minimum et un maximum gardés dans chaque classe. On renvoie des indices : les valeurs
+(et les infobulles) des points retenus restent exactes, et les chaînes de caractères ne sont
+construites que pour ces points.
+"""
+import numpy as np
+
+BUDGET_POINTS = 2000  # points par graphique
+
+
+def lttb(x, y, n_out):
+    """
+    Indices retenus par l'algorithme Largest-Triangle-Three-Buckets.
+
+    Args:
+        x, y (np.ndarray): abscisses croissantes et ordonnées (sans NaN).
+        n_out (int): nombre de points à garder (>= 3).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    bords = np.linspace(1, n - 1, n_out - 1).astype(np.intp)  # classes des points intérieurs
+    indices = np.empty(n_out, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for k in range(n_out - 2):
+        debut, fin = bords[k], bords[k + 1]
+        # moyenne de la classe suivante (dernier point pour la dernière classe)
+        suivant = slice(fin, bords[k + 2]) if k + 2 < len(bords) else slice(n - 1, n)
+        xc, yc = x[suivant].mean(), y[suivant].mean()
+        aires = np.abs((x[a] - xc) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (yc - y[a]))
+        a = debut + int(np.argmax(aires))
+        indices[k + 1] = a
+    return indices
+
+
+def extremes_locaux(y, n_classes):
+    """Indices du minimum et du maximum de y dans chacune des n_classes classes consécutives."""
+    n = len(y)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+    taille = -(-n // max(1, n_classes))
+    padding = taille * -(-n // taille) - n
+    bas = np.concatenate((y, np.full(padding, np.inf))).reshape(-1, taille)
+    haut = np.concatenate((y, np.full(padding, -np.inf))).reshape(-1, taille)
+    debuts = np.arange(bas.shape[0]) * taille
+    return np.concatenate((debuts + np.argmin(bas, axis=1), debuts + np.argmax(haut, axis=1)))
+
+
+def indices_affichage(x, series, budget=BUDGET_POINTS):
+    """
+    Indices des points à afficher pour des séries partageant les mêmes abscisses.
+
+    La moitié du budget va à LTTB, l'autre moitié aux extrêmes locaux, répartie entre les
+    séries. Premier et dernier points toujours inclus.
+
+    Args:
+        x (array of float): abscisses croissantes.
+        series (list of array): ordonnées (NaN autorisés, traités comme la valeur max).
+        budget (int): nombre de points visé.
+
+    Returns:
+        np.ndarray: indices triés, sans doublon.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+    par_serie = max(3, budget // (2 * len(series)))
+    morceaux = [np.array([0, n - 1])]
+    for y in series:
+        y = np.asarray(y, dtype=float)
+        if np.isnan(y).any():
+            y = np.where(np.isnan(y), np.nanmax(y), y)
+        morceaux.append(lttb(x, y, par_serie))
+        morceaux.append(extremes_locaux(y, par_serie // 2))
+    return np.unique(np.concatenate(morceaux))
@@ -0,0 +1,439 @@
+"""
+Lecture des parcours dans plusieurs formats : GPX, TCX, FIT et GeoJSON.
+
+Le format est reconnu au contenu (detecter_format), pas à l'extension : en-tête ".FIT" des
+fichiers FIT, objet JSON pour GeoJSON, élément racine <TrainingCenterDatabase> (TCX) ou
+<gpx>. Chaque lecteur renvoie les mêmes tableaux que gpx_stream.lire_points (latitudes,
+longitudes, altitudes NaN si absentes) et les points de passage (nom, lat, lon) ; les
+distances, la décimation DISTANCE_MIN et le calage des waypoints sont ensuite communs à tous
+les formats (gpx_stream.parcours_depuis_points).
+
+    - TCX : <Trackpoint> (activités et courses Garmin), lus en flux par expat comme les GPX ;
+      les <CoursePoint> donnent les points de passage.
+    - GeoJSON : LineString / MultiLineString (coordonnées [lon, lat, altitude]), dans une
+      Feature, une FeatureCollection ou une GeometryCollection ; les Point nommés
+      (propriété "name") donnent les points de passage.
+    - FIT : fichier binaire des montres. Un seul parcours des en-têtes de messages repère la
+      position de chaque message de données ; les champs des messages "record" (position,
+      altitude) et "course_point" sont ensuite décodés d'un bloc par numpy, avec un type
+      structuré par définition. Le CRC n'est pas vérifié.
+"""
+import json
+import math
+import struct
+from array import array
+from datetime import datetime, timezone
+from xml.parsers import expat
+
+import numpy as np
+
+from gpx_stream import DISTANCE_MIN, lire_points as lire_points_gpx, parcours_depuis_points
+
+FORMATS = ("gpx", "tcx", "fit", "geojson")
+TAILLE_ENTETE = 4096  # octets lus pour reconnaître le format
+EXTENSIONS = (".gpx", ".tcx", ".fit", ".geojson", ".json")
+
+# Messages et champs FIT utilisés (profil FIT : numéro de message global -> {champ: numéro})
+FIT_RECORD = 20
+FIT_COURSE_POINT = 32
+FIT_CHAMPS = {
+    FIT_RECORD: {"lat": 0, "lon": 1, "altitude": 2, "altitude_etendue": 78, "horodatage": 253},
+    FIT_COURSE_POINT: {"lat": 2, "lon": 3, "nom": 6},
+}
+FIT_SEMICERCLES = 180 / 2**31  # degrés par semi-cercle
+FIT_EPOQUE = 631065600  # 31/12/1989 00:00 UTC (origine des horodatages FIT) en secondes Unix
+# types de base FIT (octet de type, sans le bit d'endianness) -> type numpy
+FIT_TYPES = {0x00: "u1", 0x01: "i1", 0x02: "u1", 0x03: "i2", 0x04: "u2", 0x05: "i4", 0x06: "u4",
+             0x07: "S", 0x08: "f4", 0x09: "f8", 0x0A: "u1", 0x0B: "u2", 0x0C: "u4", 0x0D: "u1",
+             0x0E: "i8", 0x0F: "u8", 0x10: "u8"}
+
+
+def detecter_format(contenu):
+    """Format ("gpx", "tcx", "fit" ou "geojson") d'après les TAILLE_ENTETE premiers octets du contenu."""
+    if len(contenu) >= 12 and contenu[8:12] == b".FIT":
+        return "fit"
+    debut = contenu[:TAILLE_ENTETE].lstrip(b"\xef\xbb\xbf \t\r\n")
+    if debut.startswith(b"{"):
+        return "geojson"
+    if debut.startswith(b"<"):
+        return "tcx" if b"<TrainingCenterDatabase" in debut else "gpx"
+    raise ValueError("Format de parcours non reconnu (GPX, TCX, FIT ou GeoJSON attendu)")
+
+
+def lire_octets(source):
+    """Contenu complet (bytes) d'un fichier ouvert en binaire, de bytes ou d'un texte."""
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return bytes(source)
+
+
+class _FluxPrefixe:
+    """Fichier dont le début (lu pour reconnaître le format) est relu avant la suite."""
+
+    def __init__(self, debut, fichier):
+        self.debut = debut
+        self.fichier = fichier
+
+    def read(self, taille=-1):
+        if not self.debut:
+            return self.fichier.read(taille)
+        if taille is None or taille < 0:
+            morceau, self.debut = self.debut + self.fichier.read(), b""
+        else:
+            morceau, self.debut = self.debut[:taille], self.debut[taille:]
+        return morceau
+
+
+## -- TCX --
+
+def lire_points_tcx(source, waypoints=None, temps=None):
+    """Points <Trackpoint> d'un TCX (mêmes arguments et résultat que gpx_stream.lire_points)."""
+    lats = array("d")
+    lons = array("d")
+    eles = array("d")
+    point = None  # [lat, lon, ele, time] du <Trackpoint> ou [nom, lat, lon] du <CoursePoint> en cours
+    texte = None
+    champ = None
+
+    def start(name, attrs):
+        nonlocal point, texte, champ
+        tag = name.rpartition(":")[2]
+        if tag == "Trackpoint":
+            point = [math.nan, math.nan, math.nan, None]
+        elif tag == "CoursePoint" and waypoints is not None:
+            point = ["", math.nan, math.nan]
+        elif point is not None and tag in ("LatitudeDegrees", "LongitudeDegrees", "AltitudeMeters", "Name", "Time"):
+            texte, champ = [], tag
+
+    def characters(data):
+        if texte is not None:
+            texte.append(data)
+
+    def end(name):
+        nonlocal point, texte, champ
+        tag = name.rpartition(":")[2]
+        if tag == champ:
+            valeur = "".join(texte).strip()
+            texte = champ = None
+            if isinstance(point[0], str):  # CoursePoint
+                if tag == "Name":
+                    point[0] = valeur
+                elif tag in ("LatitudeDegrees", "LongitudeDegrees"):
+                    point[1 if tag == "LatitudeDegrees" else 2] = float(valeur)
+            elif tag == "Time":
+                point[3] = valeur
+            elif tag != "Name":
+                try:
+                    point[("LatitudeDegrees", "LongitudeDegrees", "AltitudeMeters").index(tag)] = float(valeur)
+                except ValueError:
+                    pass
+        elif tag == "Trackpoint" and point is not None:
+            if not math.isnan(point[0]) and not math.isnan(point[1]):  # point sans position (GPS non fixé)
+                lats.append(point[0])
+                lons.append(point[1])
+                eles.append(point[2])
+                if temps is not None:
+                    temps.append(point[3])
+            point = None
+        elif tag == "CoursePoint" and point is not None:
+            waypoints.append(tuple(point))
+            point = None
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = characters
+    if hasattr(source, "read"):
+        parser.ParseFile(source)
+    else:
+        parser.Parse(source, True)
+    return np.frombuffer(lats), np.frombuffer(lons), np.frombuffer(eles)
+
+
+## -- GeoJSON --
+
+def _geometries(objet, proprietes=None):
+    """Géométries d'un objet GeoJSON, avec les propriétés de la Feature qui les porte."""
+    genre = objet.get("type")
+    if genre == "FeatureCollection":
+        for feature in objet.get("features") or ():
+            yield from _geometries(feature)
+    elif genre == "Feature":
+        yield from _geometries(objet.get("geometry") or {}, objet.get("properties") or {})
+    elif genre == "GeometryCollection":
+        for geometrie in objet.get("geometries") or ():
+            yield from _geometries(geometrie, proprietes)
+    elif genre is not None:
+        yield objet, proprietes or {}
+
+
+def _position(p):
+    p = list(p[:3]) if len(p) >= 2 else []
+    return p + [math.nan] * (3 - len(p))
+
+
+def _coordonnees(lignes):
+    """Tableau (n, 3) lon, lat, altitude (NaN si absente) des positions GeoJSON."""
+    positions = [p for ligne in lignes for p in ligne]
+    try:
+        xyz = np.array(positions, dtype=float)
+    except ValueError:  # positions de dimensions différentes
+        xyz = np.array([_position(p) for p in positions], dtype=float).reshape(-1, 3)
+    if xyz.ndim != 2 or xyz.shape[1] < 2:
+        return np.empty((0, 3))
+    if xyz.shape[1] == 2:
+        xyz = np.column_stack((xyz, np.full(len(xyz), math.nan)))
+    return xyz[:, :3]
+
+
+def lire_points_geojson(source, waypoints=None, temps=None):
+    """
+    Points des LineString / MultiLineString d'un GeoJSON (mêmes arguments et résultat que
+    gpx_stream.lire_points). Les horodatages sont lus dans la propriété "coordTimes" (ou
+    "times") de la Feature, alignée sur les coordonnées (une liste par ligne pour un MultiLineString).
+    """
+    objet = json.loads(lire_octets(source))
+    if not isinstance(objet, dict):
+        raise ValueError("GeoJSON : objet attendu")
+    lignes = []
+    horodatages = []
+    for geometrie, proprietes in _geometries(objet):
+        genre, coordonnees = geometrie.get("type"), geometrie.get("coordinates") or []
+        if genre in ("LineString", "MultiLineString"):
+            if genre == "LineString":
+                coordonnees = [coordonnees]
+            textes = proprietes.get("coordTimes") or proprietes.get("times") or []
+            if genre == "LineString" or (textes and not isinstance(textes[0], list)):
+                textes = [textes]
+            textes = list(textes) + [[]] * (len(coordonnees) - len(textes))
+            for ligne, t in zip(coordonnees, textes):
+                lignes.append(ligne)
+                horodatages.extend(t if len(t) == len(ligne) else [None] * len(ligne))
+        elif genre == "Point" and waypoints is not None and len(coordonnees) >= 2:
+            waypoints.append((str(proprietes.get("name") or ""), float(coordonnees[1]), float(coordonnees[0])))
+    xyz = _coordonnees(lignes)
+    positionne = ~np.isnan(xyz[:, :2]).any(axis=1)
+    if temps is not None:
+        temps.extend(t for t, garde in zip(horodatages, positionne.tolist()) if garde)
+    xyz = xyz[positionne]
+    return xyz[:, 1].copy(), xyz[:, 0].copy(), xyz[:, 2].copy()
+
+
+## -- FIT --
+
+def _messages_fit(contenu):
+    """
+    Définitions des messages FIT et positions des messages de données.
+
+    Returns:
+        list of tuple: (numéro global, petit-boutiste, champs {numéro: (décalage, taille, type)},
+        taille des données, positions np.ndarray) par définition rencontrée.
+    """
+    definitions = []  # [numero, petit_boutiste, champs, taille, positions]
+    locales = {}  # type local -> définition en cours
+    debut = 0
+    while debut + 12 <= len(contenu):
+        taille_entete = contenu[debut]
+        if contenu[debut + 8:debut + 12] != b".FIT":
+            break  # octets de fin après le dernier fichier
+        taille_donnees = struct.unpack_from("<I", contenu, debut + 4)[0]
+        k = debut + taille_entete
+        fin = k + taille_donnees
+        if fin > len(contenu):
+            raise ValueError("Fichier FIT tronqué")
+        while k < fin:
+            entete = contenu[k]
+            if entete & 0x80:  # en-tête de temps compressé : message de données
+                locale = (entete >> 5) & 0x03
+            elif entete & 0x40:  # message de définition
+                locale = entete & 0x0F
+                petit_boutiste = contenu[k + 2] == 0
+                numero = struct.unpack_from("<H" if petit_boutiste else ">H", contenu, k + 3)[0]
+                n_champs = contenu[k + 5]
+                champs = {}
+                taille = 0
+                for j in range(n_champs):
+                    champ, t, type_base = contenu[k + 6 + 3 * j:k + 9 + 3 * j]
+                    champs[champ] = (taille, t, type_base & 0x1F)
+                    taille += t
+                k += 6 + 3 * n_champs
+                if entete & 0x20:  # champs développeur : seule leur taille compte
+                    n_dev = contenu[k]
+                    taille += sum(contenu[k + 2 + 3 * j] for j in range(n_dev))
+                    k += 1 + 3 * n_dev
+                locales[locale] = [numero, petit_boutiste, champs, taille, array("q")]
+                definitions.append(locales[locale])
+                continue
+            else:
+                locale = entete & 0x0F
+            definition = locales.get(locale)
+            if definition is None:
+                raise ValueError("Fichier FIT invalide : message sans définition")
+            definition[4].append(k + 1)
+            k += 1 + definition[3]
+        debut = fin + 2  # CRC du fichier
+    return [(n, pb, c, t, np.frombuffer(p, dtype=np.int64)) for n, pb, c, t, p in definitions]
+
+
+def _champs_fit(octets, definitions, numero, noms):
+    """
+    Champs `noms` (voir FIT_CHAMPS) de tous les messages `numero`, dans l'ordre du fichier.
+
+    Returns:
+        dict: nom -> np.ndarray (float, NaN si le champ est absent ou invalide ;
+        bytes pour les chaînes). Le nom "entete" donne l'octet d'en-tête de chaque message.
+    """
+    numeros = FIT_CHAMPS[numero]
+    blocs = {nom: [] for nom in noms}
+    positions = []
+    for n, petit_boutiste, champs, taille, debuts in definitions:
+        if n != numero or len(debuts) == 0:
+            continue
+        # les messages de cette définition, décodés d'un bloc
+        lignes = octets[debuts[:, None] + np.arange(taille)].reshape(-1)
+        for nom in noms:
+            champ = champs.get(numeros.get(nom))
+            valeurs = octets[debuts - 1].astype(float) if nom == "entete" else None
+            if champ is not None:
+                decalage, t, type_base = champ
+                code = FIT_TYPES.get(type_base)
+                if code == "S":
+                    brut = lignes.view(np.dtype((np.void, taille)))
+                    valeurs = np.array([bytes(b)[decalage:decalage + t].split(b"\0")[0] for b in brut.tolist()],
+                                       dtype=object)
+                elif code is not None and np.dtype(code).itemsize == t:
+                    dtype = np.dtype(code).newbyteorder("<" if petit_boutiste else ">")
+                    dtype = np.dtype({"names": ["v"], "formats": [dtype], "offsets": [decalage], "itemsize": taille})
+                    brut = lignes.view(dtype)["v"]
+                    invalide = np.iinfo(brut.dtype).max if brut.dtype.kind in "iu" else None
+                    valeurs = brut.astype(float)
+                    if invalide is not None:
+                        valeurs[brut == invalide] = math.nan
+            if valeurs is None:
+                valeurs = np.full(len(debuts), math.nan)
+            blocs[nom].append(valeurs)
+        positions.append(debuts)
+    if not positions:
+        return {nom: np.zeros(0) for nom in noms}
+    ordre = np.argsort(np.concatenate(positions), kind="stable")
+    return {nom: np.concatenate(blocs[nom])[ordre] for nom in noms}
+
+
+def _horodatages_compresses(horodatages, entetes):
+    """Complète les horodatages des en-têtes compressés (5 bits de poids faible, relatifs au message précédent)."""
+    for k in np.flatnonzero(entetes >= 0x80):
+        if k == 0 or math.isnan(horodatages[k - 1]):
+            continue
+        reference = int(horodatages[k - 1])
+        decalage = int(entetes[k]) & 0x1F
+        horodatages[k] = reference - (reference & 0x1F) + decalage + (32 if decalage < (reference & 0x1F) else 0)
+    return horodatages
+
+
+def lire_points_fit(source, waypoints=None, temps=None):
+    """Points des messages "record" d'un fichier FIT (mêmes arguments et résultat que gpx_stream.lire_points)."""
+    contenu = lire_octets(source)
+    definitions = _messages_fit(contenu)
+    octets = np.frombuffer(contenu, dtype=np.uint8)
+
+    r = _champs_fit(octets, definitions, FIT_RECORD,
+                    ("lat", "lon", "altitude", "altitude_etendue") + (("horodatage", "entete") if temps is not None else ()))
+    altitudes = np.where(np.isnan(r["altitude_etendue"]), r["altitude"], r["altitude_etendue"]) / 5 - 500
+    positionne = ~(np.isnan(r["lat"]) | np.isnan(r["lon"]))  # records sans position (GPS non fixé)
+    lats = r["lat"][positionne] * FIT_SEMICERCLES
+    lons = r["lon"][positionne] * FIT_SEMICERCLES
+    if temps is not None:
+        horodatages = _horodatages_compresses(r["horodatage"], r["entete"])
+        temps.extend((horodatages[positionne] + FIT_EPOQUE).tolist())
+
+    if waypoints is not None:
+        p = _champs_fit(octets, definitions, FIT_COURSE_POINT, ("lat", "lon", "nom"))
+        for nom, lat, lon in zip(p["nom"], p["lat"], p["lon"]):
+            if not (math.isnan(lat) or math.isnan(lon)):
+                nom = nom.decode("utf-8", "replace") if isinstance(nom, bytes) else ""
+                waypoints.append((nom, float(lat * FIT_SEMICERCLES), float(lon * FIT_SEMICERCLES)))
+    return lats, lons, altitudes[positionne]
+
+
+## -- Tous formats --
+
+LECTEURS = {"gpx": lire_points_gpx, "tcx": lire_points_tcx, "fit": lire_points_fit, "geojson": lire_points_geojson}
+
+
+def lire_points(source, waypoints=None, format=None, temps=None):
+    """
+    Points de la trace d'un parcours dans n'importe quel format (voir l'en-tête).
+
+    Args:
+        source (bytes, str ou fichier): contenu du fichier ou objet fichier ouvert en binaire.
+        waypoints (list, optional): reçoit un tuple (nom, lat, lon) par point de passage.
+        format (str, optional): "gpx", "tcx", "fit" ou "geojson" (par défaut : detecter_format).
+        temps (list, optional): reçoit l'horodatage de chaque point (texte ISO 8601 ou
+            secondes Unix selon le format, None si absent), voir lire_activite.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray, np.ndarray): latitudes, longitudes et altitudes (NaN si absente).
+    """
+    if hasattr(source, "read"):
+        # GPX et TCX sont lus en flux par expat : seul le début du fichier est lu ici
+        debut = source.read(TAILLE_ENTETE)
+        format = format or detecter_format(debut)
+        source = _FluxPrefixe(debut, source)
+    else:
+        source = lire_octets(source)
+        format = format or detecter_format(source)
+    if format not in LECTEURS:
+        raise ValueError(f"Format de parcours inconnu : {format}")
+    return LECTEURS[format](source, waypoints, temps)
+
+
+def _secondes_unix(horodatages):
+    """Horodatages (texte ISO 8601, secondes Unix ou None) -> secondes Unix (NaN si absent)."""
+    if all(isinstance(t, str) and t.endswith("Z") for t in horodatages):
+        try:  # cas courant (GPX, TCX) : UTC, conversion d'un bloc par numpy
+            dates = np.array([t[:-1] for t in horodatages], dtype="datetime64[ms]")
+            return dates.astype(np.int64) / 1000
+        except ValueError:
+            pass
+    secondes = np.full(len(horodatages), math.nan)
+    for k, t in enumerate(horodatages):
+        if isinstance(t, str):
+            try:
+                date = datetime.fromisoformat(t)
+            except ValueError:
+                continue
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=timezone.utc)
+            secondes[k] = date.timestamp()
+        elif t is not None:
+            secondes[k] = float(t)
+    return secondes
+
+
+def lire_activite(source, format=None):
+    """
+    Points horodatés d'une activité enregistrée (tous formats, voir lire_points).
+
+    Returns:
+        dict: latitudes, longitudes, altitudes (m) et horodatages (secondes Unix) de tous
+        les points ("lats", "lons", "eles", "temps") ; NaN pour les valeurs absentes.
+    """
+    temps = []
+    lats, lons, eles = lire_points(source, format=format, temps=temps)
+    return {"lats": lats, "lons": lons, "eles": eles, "temps": _secondes_unix(temps)}
+
+
+def lire_parcours(source, distance_min=DISTANCE_MIN, methode="gpxpy", format=None):
+    """Comme gpx_stream.lire_parcours, pour tous les formats (voir lire_points)."""
+    waypoints = []
+    lats, lons, eles = lire_points(source, waypoints, format)
+    return parcours_depuis_points(lats, lons, eles, waypoints, distance_min, methode)
+
+
+def lire_fichier(source, distance_min=DISTANCE_MIN, methode="gpxpy", format=None):
+    """Comme gpx_stream.lire_gpx, pour tous les formats : (distances, elevations, lats, lons)."""
+    v = lire_parcours(source, distance_min, methode, format)
+    return v["distances"], v["elevations"], v["lats"], v["lons"]
@@ -0,0 +1,74 @@
+"""
+Mise en forme de tableaux entiers de temps et d'allures.
+
+Mêmes règles que les fonctions scalaires de utils.py (format_time, vitesse_to_allure), mais
+en une passe sur les tableaux : les parties entières sont calculées par numpy, puis les
+chaînes sont assemblées à partir d'une table des nombres à 2 chiffres (les valeurs hors
+table, rares, sont formatées une par une). Les graphes travaillent sur les valeurs
+numériques ; ces fonctions ne servent qu'aux libellés des points affichés.
+"""
+import numpy as np
+
+_DEUX_CHIFFRES = np.array([f"{k:02d}" for k in range(100)])
+
+
+def _deux_chiffres(n):
+    """Entiers au format %02d."""
+    n = np.asarray(n, dtype=np.int64)
+    hors_table = (n < 0) | (n > 99)
+    textes = _DEUX_CHIFFRES[np.clip(n, 0, 99)]
+    if hors_table.any():
+        textes = textes.astype(object)
+        textes[hors_table] = [f"{k:02d}" for k in n[hors_table].tolist()]
+        textes = textes.astype(str)
+    return textes
+
+
+def _joindre(*parties):
+    texte = parties[0]
+    for partie in parties[1:]:
+        texte = np.char.add(np.char.add(texte, ":"), partie)
+    return texte
+
+
+def formater_temps(secondes):
+    """Temps (s) -> "hh:mm:ss" comme utils.format_time ; NaN ou None -> "-"."""
+    secondes = np.asarray(secondes, dtype=float)
+    absent = np.isnan(secondes)
+    x = np.where(absent, 0.0, secondes)
+    textes = _joindre(_deux_chiffres(x // 3600), _deux_chiffres((x % 3600) // 60), _deux_chiffres(np.floor(x % 60)))
+    if absent.any():
+        textes = np.where(absent, "-", textes)
+    return textes
+
+
+def allures_secondes(vitesses):
+    """Allure en secondes par km, arrondie comme utils.vitesse_to_allure (NaN si vitesse nulle)."""
+    vitesses = np.asarray(vitesses, dtype=float)
+    secondes = np.full_like(vitesses, np.nan)
+    np.divide(1000, vitesses, out=secondes, where=vitesses != 0)
+    return np.round(secondes)  # arrondi au pair le plus proche, comme round()
+
+
+def formater_allures(vitesses):
+    """Vitesses (m/s) -> "mm:ss" comme utils.vitesse_to_allure ; vitesse nulle ou NaN -> "∞"."""
+    secondes = allures_secondes(vitesses)
+    infini = np.isnan(secondes)
+    s = np.where(infini, 0, secondes).astype(np.int64)
+    textes = _joindre(_deux_chiffres(s // 60), _deux_chiffres(s % 60))
+    if infini.any():
+        textes = np.where(infini, "∞", textes)
+    return textes
+
+
+def formater_allures_min_km(paces):
+    """Allures en min/km (compute_paces, None ou NaN acceptés) -> "mm:ss"."""
+    paces = np.asarray(paces, dtype=float)
+    vitesses = np.full_like(paces, np.nan)
+    np.divide(1000, 60 * paces, out=vitesses, where=paces > 0)  # même calcul que vitesse_to_allure(1000/(60*p))
+    return formater_allures(vitesses)
+
+
+def vitesses_ascensionnelles(allure_sec, pentes):
+    """Vitesse verticale (m/h) à partir de l'allure (s/km) et de la pente (%), comme utils.allure_to_v_asc."""
+    return 3600 / np.asarray(allure_sec, dtype=float) * np.asarray(pentes, dtype=float) * 10
@@ -0,0 +1,101 @@
+"""
+Géométrie simplifiée du parcours pour la carte folium.
+
+Douglas-Peucker (vectorisé) est calculé une seule fois sous forme d'« importance » : pour
+chaque point, la tolérance (en mètres) jusqu'à laquelle il est conservé. Chaque niveau de
+simplification est alors un simple filtre importance > tolérance, sans refaire l'algorithme. Le tableau
+d'importance est mis en cache avec le parcours (voir course_cache.py) ; les coordonnées
+brutes restent disponibles pour l'export.
+"""
+import math
+
+import numpy as np
+
+from gpx_stream import ONE_DEGREE
+
+TOLERANCES = (2.0, 10.0, 50.0, 200.0)  # mètres, du plus fin au plus grossier
+BUDGET_CARTE = 2000  # points de la polyligne affichée
+
+
+def projeter(lats, lons):
+    """Coordonnées planes locales en mètres (projection équirectangulaire)."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    coef = math.cos(math.radians(float(np.mean(lats)))) if len(lats) else 1.0
+    return lons * coef * ONE_DEGREE, lats * ONE_DEGREE
+
+
+def importance_douglas_peucker(lats, lons, tolerance_min=TOLERANCES[0]):
+    """
+    Importance Douglas-Peucker de chaque point, en mètres.
+
+    Un point d'importance e est conservé par la simplification de tolérance t si e > t.
+    Les extrémités valent inf ; les points sous tolerance_min valent 0 (ils ne sont
+    conservés à aucun niveau), ce qui borne le nombre de découpages.
+    Tous les intervalles d'une même profondeur de l'algorithme sont découpés ensemble :
+    chaque passe est une opération sur les tableaux des points encore actifs.
+
+    Returns:
+        np.ndarray: importance de chaque point.
+    """
+    x, y = projeter(lats, lons)
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[[0, -1]] = np.inf
+    cles = np.array([0, n - 1]) if n > 1 else np.array([0])  # points conservés, triés
+    actif = np.ones(n, dtype=bool)  # points intérieurs à un intervalle encore à découper
+    actif[cles] = False
+
+    while True:
+        points = np.flatnonzero(actif)
+        if len(points) == 0:
+            break
+        intervalle = np.searchsorted(cles, points, side="right") - 1
+        a, b = cles[intervalle], cles[intervalle + 1]
+
+        # distance au segment [a, b] (au point a si la corde est nulle, cas d'une boucle)
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        longueur2 = dx * dx + dy * dy
+        t = np.zeros(len(points))
+        np.divide((x[points] - x[a]) * dx + (y[points] - y[a]) * dy, longueur2, out=t, where=longueur2 > 0)
+        np.clip(t, 0, 1, out=t)
+        distances = np.hypot(x[points] - (x[a] + t * dx), y[points] - (y[a] + t * dy))
+
+        # point le plus éloigné de chaque intervalle
+        debuts = np.flatnonzero(np.r_[True, intervalle[1:] != intervalle[:-1]])
+        groupe = np.repeat(np.arange(len(debuts)), np.diff(np.r_[debuts, len(points)]))
+        d_max = np.maximum.reduceat(distances, debuts)
+        candidats = np.flatnonzero(distances == d_max[groupe])
+        _, premiers = np.unique(groupe[candidats], return_index=True)
+        m = points[candidats[premiers]]
+
+        decoupe = d_max >= tolerance_min
+        actif[points[~decoupe[groupe]]] = False  # intervalles terminés
+        m = m[decoupe]
+        # un point n'est jamais plus important que l'intervalle qui le contient
+        parent = np.minimum(importance[a[debuts]], importance[b[debuts]])[decoupe]
+        importance[m] = np.minimum(d_max[decoupe], parent)
+        actif[m] = False
+        cles = np.sort(np.concatenate((cles, m)))
+    return importance
+
+
+def simplifier(importance, tolerance):
+    """Indices des points conservés pour une tolérance en mètres."""
+    return np.flatnonzero(importance > tolerance)
+
+
+def niveaux(importance, tolerances=TOLERANCES):
+    """{tolérance: indices} pour chaque niveau de simplification."""
+    return {t: simplifier(importance, t) for t in tolerances}
+
+
+def indices_carte(importance, budget=BUDGET_CARTE, tolerances=TOLERANCES):
+    """Indices du niveau le plus fin qui tient dans le budget de points (sinon le plus grossier)."""
+    for t in sorted(tolerances):
+        indices = simplifier(importance, t)
+        if len(indices) <= budget:
+            return indices
+    return indices
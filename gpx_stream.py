@@ -0,0 +1,276 @@
+"""
+Lecture en flux des fichiers GPX.
+
+Les points <trkpt> sont lus au fil de l'analyse XML incrémentale (expat), sans construire
+l'arbre d'objets gpxpy : les coordonnées vont directement dans des tableaux compacts.
+Les distances entre points sont ensuite calculées d'un bloc sur les tableaux, puis la
+décimation DISTANCE_MIN est appliquée sur les distances cumulées : une recherche
+dichotomique donne le point suivant de chaque point, et la chaîne partant du premier point
+est suivie par sauts doublés (O(n log n) en opérations numpy, sans boucle par point retenu).
+
+Méthodes de distance :
+    - "gpxpy" (défaut) : même formule que point.distance_3d de gpxpy (approximation plane
+      avec altitude, haversine au-delà de 0.2°). Seuls les arrondis de numpy diffèrent :
+      l'écart relatif sur la distance totale est de l'ordre de 1e-12.
+    - "haversine" : haversine sur tous les segments, combinée à la dénivelée.
+      L'écart avec gpxpy est de l'ordre de 1e-8 en relatif pour des points espacés de quelques mètres.
+ecart_distance_totale() mesure cet écart et le compare à une tolérance choisie
+(TOLERANCE_DISTANCE par défaut).
+"""
+import math
+from array import array
+from xml.parsers import expat
+
+import numpy as np
+
+DISTANCE_MIN = 30  # mètres entre 2 points retenus
+TOLERANCE_DISTANCE = 1e-6  # écart relatif maximal de la distance totale avec gpxpy
+
+# Mêmes constantes que gpxpy.geo
+EARTH_RADIUS = 6378.137 * 1000
+ONE_DEGREE = (2*math.pi*EARTH_RADIUS) / 360  # ==> 111.319 km
+
+
+def haversine_distance(latitude_1, longitude_1, latitude_2, longitude_2):
+    """Distance haversine en mètres (formule de gpxpy.geo)."""
+    d_lon = math.radians(longitude_1 - longitude_2)
+    lat1 = math.radians(latitude_1)
+    lat2 = math.radians(latitude_2)
+    d_lat = lat1 - lat2
+
+    a = math.pow(math.sin(d_lat/2), 2) + \
+        math.pow(math.sin(d_lon/2), 2) * math.cos(lat1) * math.cos(lat2)
+    c = 2 * math.asin(math.sqrt(a))
+    return EARTH_RADIUS * c
+
+
+def distance_3d(latitude_1, longitude_1, elevation_1, latitude_2, longitude_2, elevation_2):
+    """Distance en mètres entre deux points, identique à gpxpy.geo.distance (altitude None -> 2D)."""
+    if abs(latitude_1 - latitude_2) > .2 or abs(longitude_1 - longitude_2) > .2:
+        return haversine_distance(latitude_1, longitude_1, latitude_2, longitude_2)
+
+    coef = math.cos(math.radians(latitude_1))
+    x = latitude_1 - latitude_2
+    y = (longitude_1 - longitude_2) * coef
+    distance_2d = math.sqrt(x * x + y * y) * ONE_DEGREE
+
+    if elevation_1 is None or elevation_2 is None or elevation_1 == elevation_2:
+        return distance_2d
+    return math.sqrt(distance_2d ** 2 + (elevation_1 - elevation_2) ** 2)
+
+
+def distances_segments(lats, lons, eles, methode="gpxpy"):
+    """
+    Distances 3D en mètres entre points successifs, calculées sur des tableaux.
+
+    Args:
+        lats, lons (np.ndarray): coordonnées en degrés.
+        eles (np.ndarray): altitudes en mètres (NaN si absente -> distance 2D).
+        methode (str): "gpxpy" ou "haversine" (voir l'en-tête du module).
+
+    Returns:
+        np.ndarray: len(lats) - 1 distances.
+    """
+    # même ordre que point.distance_3d(last_point) : point courant en premier
+    lat1, lon1, ele1 = lats[1:], lons[1:], eles[1:]
+    lat2, lon2, ele2 = lats[:-1], lons[:-1], eles[:-1]
+
+    d_lon = np.radians(lon1 - lon2)
+    rlat1 = np.radians(lat1)
+    rlat2 = np.radians(lat2)
+    a = np.sin((rlat1 - rlat2)/2)**2 + np.sin(d_lon/2)**2 * np.cos(rlat1) * np.cos(rlat2)
+    d_haversine = EARTH_RADIUS * 2 * np.arcsin(np.sqrt(a))
+
+    dz = ele1 - ele2
+    dz[np.isnan(dz)] = 0  # altitude manquante : distance 2D
+
+    if methode == "haversine":
+        return np.sqrt(d_haversine**2 + dz**2)
+    if methode != "gpxpy":
+        raise ValueError(f"Méthode de distance inconnue : {methode}")
+
+    x = lat1 - lat2
+    y = (lon1 - lon2) * np.cos(rlat1)
+    distance_2d = np.sqrt(x * x + y * y) * ONE_DEGREE
+    d = np.where(dz == 0, distance_2d, np.sqrt(distance_2d**2 + dz**2))
+    loin = (np.abs(lat1 - lat2) > .2) | (np.abs(lon1 - lon2) > .2)
+    d[loin] = d_haversine[loin]
+    return d
+
+
+def decimer(cumul, distance_min=DISTANCE_MIN):
+    """
+    Indices des points retenus : premier point, puis chaque point situé à au moins
+    distance_min mètres (le long du parcours) du dernier point retenu.
+
+    Args:
+        cumul (np.ndarray): distances cumulées en mètres (croissantes).
+        distance_min (float): distance minimale en mètres entre 2 points retenus
+            (0 ou moins : tous les points).
+    """
+    n = len(cumul)
+    if n == 0 or distance_min <= 0:
+        return np.arange(n, dtype=np.intp)
+    # suivant[j] : premier point à au moins distance_min de j (n : aucun, puis n -> n)
+    suivant = np.append(np.searchsorted(cumul, cumul + distance_min, side="left"), n)
+    saut = suivant  # 2^k pas
+    indices = np.zeros(1, dtype=np.intp)  # les 2^k premiers points de la chaîne partant de 0
+    while suivant[indices[-1]] < n:
+        suite = saut[indices]  # les 2^k suivants (croissants), n une fois la chaîne finie
+        indices = np.concatenate((indices, suite[suite < n]))
+        saut = saut[saut]  # 2^(k+1) pas
+    return indices
+
+
+def ecart_distance_totale(lats, lons, eles, methode="gpxpy", tolerance=TOLERANCE_DISTANCE):
+    """
+    Écart relatif entre la distance totale vectorisée et le calcul point par point de gpxpy.
+
+    ValueError si l'écart dépasse tolerance (None : pas de vérification).
+    """
+    reference = 0.0
+    for k in range(1, len(lats)):
+        e1 = None if math.isnan(eles[k]) else float(eles[k])
+        e2 = None if math.isnan(eles[k-1]) else float(eles[k-1])
+        reference += distance_3d(float(lats[k]), float(lons[k]), e1, float(lats[k-1]), float(lons[k-1]), e2) or 0
+    total = float(np.sum(distances_segments(lats, lons, eles, methode)))
+    ecart = abs(total - reference) / reference if reference else 0.0
+    if tolerance is not None and ecart > tolerance:
+        raise ValueError(f"Distance totale ({methode}) : écart relatif {ecart:.3g} avec gpxpy > {tolerance:.3g}")
+    return ecart
+
+
+def lire_points(source, waypoints=None, temps=None):
+    """
+    Lit en flux tous les points de trace d'un GPX.
+
+    Args:
+        source (bytes, str ou fichier): contenu GPX ou objet fichier ouvert en binaire.
+        waypoints (list, optional): si fournie, reçoit un tuple (nom, lat, lon) par <wpt>
+            (ravitaillements, points de contrôle), dans la même passe.
+        temps (list, optional): si fournie, reçoit le texte de la balise <time> de chaque
+            point (None si absente), voir formats.lire_activite.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray, np.ndarray): latitudes, longitudes et altitudes
+        (NaN si absente) de tous les points <trkpt>, dans l'ordre du fichier.
+    """
+    lats = array("d")
+    lons = array("d")
+    eles = array("d")
+    texte = None  # morceaux de texte de la balise <ele> ou <time> (ou <name> d'un waypoint) en cours
+    dans_point = False
+    waypoint = None  # [nom, lat, lon] du <wpt> en cours
+
+    def start(name, attrs):
+        nonlocal texte, dans_point, waypoint
+        tag = name.rpartition(":")[2]
+        if tag == "trkpt":
+            lats.append(float(attrs["lat"]))
+            lons.append(float(attrs["lon"]))
+            eles.append(math.nan)
+            if temps is not None:
+                temps.append(None)
+            dans_point = True
+        elif tag == "ele" and dans_point:
+            texte = []
+        elif tag == "time" and dans_point and temps is not None:
+            texte = []
+        elif tag == "wpt" and waypoints is not None:
+            waypoint = ["", float(attrs["lat"]), float(attrs["lon"])]
+        elif tag == "name" and waypoint is not None:
+            texte = []
+
+    def characters(data):
+        if texte is not None:
+            texte.append(data)
+
+    def end(name):
+        nonlocal texte, dans_point, waypoint
+        tag = name.rpartition(":")[2]
+        if tag == "ele" and texte is not None and dans_point:
+            try:
+                eles[-1] = float("".join(texte))
+            except ValueError:
+                pass
+            texte = None
+        elif tag == "time" and texte is not None and dans_point:
+            temps[-1] = "".join(texte).strip()
+            texte = None
+        elif tag == "trkpt":
+            dans_point = False
+        elif tag == "name" and texte is not None and waypoint is not None:
+            waypoint[0] = "".join(texte).strip()
+            texte = None
+        elif tag == "wpt" and waypoint is not None:
+            waypoints.append(tuple(waypoint))
+            waypoint = None
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = characters
+
+    if hasattr(source, "read"):
+        parser.ParseFile(source)
+    else:
+        parser.Parse(source, True)
+
+    return np.frombuffer(lats), np.frombuffer(lons), np.frombuffer(eles)
+
+
+def lire_parcours(source, distance_min=DISTANCE_MIN, methode="gpxpy"):
+    """
+    Lit un GPX, applique la décimation et garde les waypoints.
+
+    Args:
+        source (bytes, str ou fichier): contenu GPX ou objet fichier ouvert en binaire
+            (par exemple le fichier chargé par st.file_uploader).
+        distance_min (float): distance minimale en mètres entre 2 points retenus.
+        methode (str): calcul des distances, "gpxpy" ou "haversine".
+
+    Returns:
+        dict: distances cumulées (km) et altitudes (m) des points retenus ("distances",
+        "elevations") ; latitudes, longitudes et distances cumulées (km) de tous les points
+        de la trace ("lats", "lons", "distances_trace") ; noms et coordonnées des
+        waypoints ("wpt_noms", "wpt_lats", "wpt_lons"). Les altitudes manquantes valent NaN.
+    """
+    waypoints = []
+    lats, lons, eles = lire_points(source, waypoints)
+    return parcours_depuis_points(lats, lons, eles, waypoints, distance_min, methode)
+
+
+def parcours_depuis_points(lats, lons, eles, waypoints=(), distance_min=DISTANCE_MIN, methode="gpxpy"):
+    """
+    Distances, décimation et waypoints à partir des points d'une trace (tout format, voir formats.py).
+
+    Args:
+        lats, lons, eles (np.ndarray): coordonnées (degrés) et altitudes (m, NaN si absente).
+        waypoints (list of tuple): (nom, lat, lon) des points de passage.
+
+    Returns:
+        dict: voir lire_parcours().
+    """
+    cumul = np.zeros(len(lats))
+    if len(lats) > 1:
+        np.cumsum(distances_segments(lats, lons, eles, methode), out=cumul[1:])
+    retenus = decimer(cumul, distance_min)
+    noms, wpt_lats, wpt_lons = zip(*waypoints) if waypoints else ((), (), ())
+    return {"distances": cumul[retenus] / 1000, "elevations": eles[retenus],
+            "lats": lats, "lons": lons, "distances_trace": cumul / 1000,
+            "wpt_noms": np.array(noms, dtype=str), "wpt_lats": np.array(wpt_lats, dtype=float),
+            "wpt_lons": np.array(wpt_lons, dtype=float)}
+
+
+def lire_gpx(source, distance_min=DISTANCE_MIN, methode="gpxpy"):
+    """
+    Lit un GPX et applique la décimation (voir lire_parcours).
+
+    Returns:
+        tuple(np.ndarray, ...): distances cumulées (km) et altitudes (m) des points retenus,
+        puis latitudes et longitudes de tous les points de la trace.
+        Les altitudes manquantes valent NaN.
+    """
+    v = lire_parcours(source, distance_min, methode)
+    return v["distances"], v["elevations"], v["lats"], v["lons"]
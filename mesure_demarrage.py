@@ -0,0 +1,184 @@
+"""
+Mesure du temps de démarrage : coût d'import de chaque module.
+
+Chaque mesure tourne dans un nouvel interpréteur (python -X importtime), comme au démarrage
+à froid d'un conteneur : le temps d'un module inclut tout ce qu'il importe. Sont mesurés les
+modules du dépôt (MODULES) et les imports de niveau module de app.py, lus par ast (le script
+ne s'importe pas hors de `streamlit run`). Pour chacun, on garde le meilleur de
+`repetitions` essais et les dépendances les plus coûteuses.
+
+Garde-fous :
+    - aucun module de MODULES_DIFFERES (plotly, folium, pandas...) ne doit être chargé par
+      les imports de démarrage de app.py, en plus de ce que charge streamlit lui-même : ils
+      sont importés dans les sections qui les utilisent ;
+    - avec --reference, un module dont le temps dépasse seuil x référence + MARGE_MS est
+      une régression.
+Le script échoue (code 1) si un garde-fou n'est pas respecté. Un module absent de
+l'environnement (streamlit par exemple) est noté dans "absents" et n'est pas mesuré.
+
+Usage :
+    python mesure_demarrage.py --sortie demarrage.json
+    python mesure_demarrage.py --reference demarrage.json --seuil 1.5
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+MODULES = ("utils", "formats", "course", "course_cache", "checkpoints", "montecarlo",
+           "formatting", "profiling", "calibration", "batch_gpx", "service")
+MODULES_DIFFERES = ("plotly", "folium", "streamlit_folium", "streamlit_plotly_events", "pandas",
+                    "gpxpy", "matplotlib", "pyarrow")
+MARGE_MS = 20.0  # bruit toléré sur les petites valeurs
+N_DEPENDANCES = 5
+
+
+def imports_app(chemin=os.path.join(DOSSIER, "app.py")):
+    """Modules importés au niveau module du script (hors imports différés dans les sections)."""
+    with open(chemin, encoding="utf-8") as f:
+        arbre = ast.parse(f.read())
+    modules = []
+    for noeud in arbre.body:
+        if isinstance(noeud, ast.Import):
+            modules += [alias.name for alias in noeud.names]
+        elif isinstance(noeud, ast.ImportFrom) and noeud.level == 0:
+            modules.append(noeud.module)
+    return list(dict.fromkeys(modules))
+
+
+def _lancer(code):
+    """(sortie, lignes -X importtime) d'un nouvel interpréteur exécutant `code`."""
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=DOSSIER,
+                       capture_output=True, text=True)
+    if p.returncode != 0:
+        raise ImportError(p.stderr.strip().splitlines()[-1] if p.stderr.strip() else f"code {p.returncode}")
+    return p.stdout, [ligne for ligne in p.stderr.splitlines() if ligne.startswith("import time:")]
+
+
+def _analyser(lignes):
+    """[(niveau, module, cumulé en ms)] des imports du code mesuré (sans ceux du démarrage de Python)."""
+    entrees = []
+    for ligne in lignes:
+        _, cumule, nom = ligne.split("|", 2)
+        try:
+            cumule_us = int(cumule)
+        except ValueError:  # en-tête
+            continue
+        champ = nom[1:]
+        niveau = (len(champ) - len(champ.lstrip())) // 2
+        entrees.append((niveau, champ.strip(), cumule_us / 1000))
+        if (niveau, champ.strip()) == (0, "site"):  # fin des imports du démarrage de l'interpréteur
+            entrees = []
+    return entrees
+
+
+def mesurer(modules, repetitions=3):
+    """
+    Temps d'import (ms) de `modules` dans un interpréteur neuf.
+
+    Returns:
+        dict: "temps_ms" (meilleur essai, somme des imports de premier niveau),
+        "dependances" (les plus coûteuses, en ms), "absents" (modules non installés, ignorés)
+        et "modules_charges" (sys.modules).
+    """
+    code = "".join(f"try:\n    import {m}\nexcept ImportError:\n    print('absent:{m}')\n" for m in modules)
+    code += "import sys\nprint('\\n'.join(sorted(sys.modules)))"
+    meilleur = None
+    for _ in range(repetitions):
+        sortie, lignes = _lancer(code)
+        entrees = _analyser(lignes)
+        total = sum(cumule for niveau, _, cumule in entrees if niveau == 0)
+        if meilleur is None or total < meilleur[0]:
+            meilleur = (total, entrees, sortie.split())
+    total, entrees, sortie = meilleur
+    dependances = sorted(((nom, cumule) for niveau, nom, cumule in entrees if niveau == 1),
+                         key=lambda e: -e[1])[:N_DEPENDANCES]
+    absents = [m.partition(":")[2] for m in sortie if m.startswith("absent:")]
+    charges = [m for m in sortie if not m.startswith("absent:")]
+    return {"temps_ms": total, "dependances": dict(dependances), "absents": absents, "modules_charges": charges}
+
+
+def lancer(modules=MODULES, repetitions=3):
+    """Mesures (dict) de chaque module et des imports de démarrage de app.py."""
+    resultats = []
+    cibles = [(m, [m]) for m in modules] + [("app.py", imports_app())]
+    for nom, importes in cibles:
+        try:
+            mesure = mesurer(importes, repetitions)
+        except ImportError as e:
+            resultats.append({"module": nom, "temps_ms": None, "erreur": str(e)})
+            print(f"{nom:<16} {'-':>10}    {e}", file=sys.stderr)
+            continue
+        charges = mesure.pop("modules_charges")
+        resultat = {"module": nom, **mesure, "erreur": ""}
+        if nom == "app.py":
+            resultat["differes_charges"] = differes_charges(importes, charges)
+        resultats.append(resultat)
+        lourdes = ", ".join(f"{d} {t:.0f}" for d, t in mesure["dependances"].items())
+        absents = f" ; non installés : {', '.join(mesure['absents'])}" if mesure["absents"] else ""
+        print(f"{nom:<16} {mesure['temps_ms']:10.1f} ms ({lourdes}){absents}", file=sys.stderr)
+    return resultats
+
+
+def differes_charges(importes, charges):
+    """Modules de MODULES_DIFFERES chargés par `importes` en plus de ce que charge streamlit."""
+    deja = set()
+    if "streamlit" in importes and "streamlit" in charges:
+        deja = set(_lancer("import streamlit, sys\nprint('\\n'.join(sys.modules))")[0].split())
+    paquets = {m.partition(".")[0] for m in charges if m not in deja}
+    return sorted(paquets & set(MODULES_DIFFERES))
+
+
+def comparer(resultats, reference, seuil):
+    """Garde-fous : modules différés chargés au démarrage et temps dépassant seuil x référence."""
+    ref = {r["module"]: r for r in reference["resultats"]} if reference else {}
+    problemes = []
+    for r in resultats:
+        if r.get("differes_charges"):
+            problemes.append(f"{r['module']} charge au démarrage : {', '.join(r['differes_charges'])}")
+        ancien = ref.get(r["module"])
+        if ancien is None or r["temps_ms"] is None or ancien["temps_ms"] is None:
+            continue
+        if r["temps_ms"] > seuil * ancien["temps_ms"] + MARGE_MS:
+            problemes.append(f"{r['module']} : {r['temps_ms']:.1f} ms > {seuil} x {ancien['temps_ms']:.1f} ms"
+                             f" + {MARGE_MS:.0f} ms")
+    return problemes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--sortie", default="demarrage.json")
+    parser.add_argument("--reference", help="JSON d'un run précédent à comparer")
+    parser.add_argument("--seuil", type=float, default=1.5, help="ratio maximal toléré / référence")
+    args = parser.parse_args(argv)
+
+    resultats = lancer(args.modules, args.repetitions)
+    rapport = {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "resultats": resultats,
+    }
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2)
+
+    reference = None
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = json.load(f)
+    problemes = comparer(resultats, reference, args.seuil)
+    for ligne in problemes:
+        print("RÉGRESSION", ligne, file=sys.stderr)
+    if problemes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
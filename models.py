@@ -0,0 +1,131 @@
+"""
+Registre des modèles de coût (vitesse ajustée à la pente).
+
+Un modèle est défini une seule fois par son polynôme de coût C(i) (i = pente en fraction)
+et un éventuel plafond de vitesse. La vitesse ajustée vaut
+    v(pente) = min(plafond * v_plat, v_plat * C(0) / C(i), vitesse_max)
+Le facteur C(0) / C(i) est compilé en une table dense en fonction de la pente, interpolée
+linéairement (le plafond est appliqué ensuite) : évaluer un modèle coûte alors le même prix
+quel que soit le degré du polynôme. L'écart relatif avec le polynôme reste sous 1e-7 dans la
+table ; hors de la table (pentes au-delà de +/-50 %), le polynôme est évalué directement.
+
+Pour ajouter un modèle (par exemple celui ajusté par approximation_courbe_modele_strava.py) :
+    enregistrer_modele(ModeleCout.depuis_polynome("perso", coeffs))
+puis passer model="perso" aux fonctions de utils.py. calibration.py ajuste un tel modèle sur
+les activités enregistrées d'un coureur (calibration.modele_depuis_historique).
+"""
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+
+import numpy as np
+
+PENTE_MIN_TABLE = -50.0  # %
+PENTE_MAX_TABLE = 50.0  # %
+PAS_TABLE = 0.005  # %
+
+
+COEFFS_MINETTI = (155.4, -30.4, -43.3, 46.3, 19.5, 3.6)  # degré 5 -> 0
+COEFFS_STRAVA = (-3.32959069, 14.61846764, 3.07428877, 1.03357331)  # degré 3 -> 0
+
+
+def minetti_cost_running(i):
+    a, b, c, d, e, f = COEFFS_MINETTI
+    return a * i**5 + b * i**4 + c*i**3 + d*i**2 + e*i + f
+
+def strava_cost(i):
+    a, b, c, d = COEFFS_STRAVA
+    return a * i**3 + b * i**2 + c*i + d
+
+
+@dataclass
+class ModeleCout:
+    nom: str
+    cout: Callable[[np.ndarray], np.ndarray]  # coût en fonction de la pente en fraction (scalaire ou tableau)
+    plafond: float = None  # vitesse max en multiple de la vitesse sur plat (1.3 pour Minetti)
+    vitesse_max: float = None  # vitesse max absolue en m/s
+    coeffs: tuple = None  # coefficients du polynôme de coût (degré décroissant), si connus
+    _table: tuple = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def depuis_polynome(cls, nom, coeffs, **kwargs):
+        """Modèle dont le coût est np.polyval(coeffs, i) (coefficients de np.polyfit)."""
+        coeffs = np.asarray(coeffs, dtype=float)
+        # partial plutôt qu'une lambda : le modèle reste picklable (pools de processus)
+        return cls(nom, partial(np.polyval, coeffs), coeffs=tuple(coeffs.tolist()), **kwargs)
+
+    def _facteurs_sans_plafond(self, slopes):
+        i = np.asarray(slopes, dtype=float) / 100
+        with np.errstate(divide="ignore"):
+            return self.cout(0) / self.cout(i)
+
+    def facteurs_exacts(self, slopes):
+        """Facteur v_ajustée / v_plat (avant vitesse_max), évalué sur le polynôme."""
+        facteurs = self._facteurs_sans_plafond(slopes)
+        if self.plafond is not None:
+            facteurs = np.minimum(self.plafond, facteurs)
+        return facteurs
+
+    def compiler(self, pente_min=PENTE_MIN_TABLE, pente_max=PENTE_MAX_TABLE, pas=PAS_TABLE):
+        """Construit la table des facteurs sur [pente_min, pente_max] avec un pas en %."""
+        n = int(round((pente_max - pente_min) / pas)) + 1
+        grille = pente_min + pas * np.arange(n)
+        # le plafond est appliqué après interpolation pour garder le coude exact
+        self._table = (pente_min, pas, self._facteurs_sans_plafond(grille))
+        return self
+
+    def facteurs(self, slopes):
+        """Facteur v_ajustée / v_plat par interpolation dans la table (compilée au besoin)."""
+        if self._table is None:
+            self.compiler()
+        pente_min, pas, table = self._table
+        slopes = np.asarray(slopes, dtype=float)
+        position = (slopes - pente_min) / pas
+        dedans = (position >= 0) & (position <= len(table) - 1)
+        k = np.clip(position.astype(np.intp), 0, len(table) - 2)
+        frac = position - k
+        facteurs = table[k] + (table[k + 1] - table[k]) * frac
+        if self.plafond is not None:
+            facteurs = np.minimum(self.plafond, facteurs)
+        if not dedans.all():
+            facteurs = np.where(dedans, facteurs, self.facteurs_exacts(slopes))
+        return facteurs
+
+    def vitesses(self, flat_speed, slopes):
+        """Vitesses ajustées (m/s) pour des pentes en %."""
+        v = flat_speed * self.facteurs(slopes)
+        if self.vitesse_max is not None:
+            v = np.minimum(v, self.vitesse_max)
+        return v
+
+    def vitesse(self, flat_speed, slope):
+        """Vitesse ajustée (m/s) pour une pente en %, calcul exact sans table."""
+        v = float(flat_speed * self.facteurs_exacts(slope))
+        if self.vitesse_max is not None:
+            v = min(v, self.vitesse_max)
+        return v
+
+
+MODELES = {}
+
+
+def enregistrer_modele(modele):
+    """Ajoute un modèle au registre (remplace un modèle de même nom)."""
+    MODELES[modele.nom] = modele
+    return modele
+
+
+def get_modele(model):
+    """Renvoie le modèle à partir de son nom, ou le modèle lui-même."""
+    if isinstance(model, ModeleCout):
+        return model
+    try:
+        return MODELES[model]
+    except KeyError:
+        raise ValueError(f"Modèle inconnu : {model} (disponibles : {', '.join(MODELES)})") from None
+
+
+# Sans cette limite, un coureur avec une VAP de 10,6km/h descendrait à plus de 20km/h
+# pour des pentes entre -13 et -21%
+MINETTI = enregistrer_modele(ModeleCout("minetti", minetti_cost_running, plafond=1.3, coeffs=COEFFS_MINETTI))
+STRAVA = enregistrer_modele(ModeleCout("strava", strava_cost, coeffs=COEFFS_STRAVA))
@@ -0,0 +1,141 @@
+"""
+Distribution du temps de course par Monte Carlo.
+
+Chaque tirage perturbe :
+    - la vitesse sur plat : v_plat * exp(sigma_vitesse * N) (médiane v_plat) ;
+    - le plafond de vitesse en descente (modèles qui en ont un, Minetti) : plafond * exp(sigma_plafond * N) ;
+    - chaque coefficient du polynôme de coût : c * (1 + sigma_coeffs * N). Le coût tiré est
+      borné à COUT_MIN_RELATIF x C(0) du modèle : aux pentes extrêmes, un polynôme perturbé
+      peut passer sous 0 et le segment ne doit pas disparaître du temps total.
+Les tirages sont évalués ensemble sur des tableaux (tirages x classes de pente). Le parcours
+est d'abord découpé aux points de passage (les points sont insérés dans le profil, sans
+changer les pentes), puis les segments de chaque tronçon sont regroupés par classe de pente
+comme dans slope_index.py : le temps de chaque tronçon est un produit matriciel
+(1 / vitesses) @ mètres, et le coût ne dépend plus du nombre de points de la trace.
+pas_pente=None garde les segments exacts.
+Les tirages sont traités par blocs (mémoire bornée par memoire_max) et, si processus > 1,
+répartis sur un pool de processus. Chaque bloc a sa propre graine (SeedSequence.spawn) :
+le résultat ne dépend pas du nombre de processus.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from models import get_modele
+from slope_index import PAS_PENTE
+from utils import segment_arrays
+
+QUANTILES = (10, 50, 90)
+N_TIRAGES = 5000
+SIGMA_VITESSE = 0.05
+SIGMA_PLAFOND = 0.10
+SIGMA_COEFFS = 0.05
+COUT_MIN_RELATIF = 0.1  # plancher du coût tiré, en fraction du coût sur plat du modèle
+MEMOIRE_MAX = 64 * 1024**2  # octets pour les tableaux intermédiaires d'un bloc
+
+
+@dataclass
+class DistributionTemps:
+    quantiles: tuple  # percentiles calculés, ex. (10, 50, 90)
+    arrivee: np.ndarray  # (n_quantiles,) temps d'arrivée en secondes
+    passages: np.ndarray  # (n_quantiles, n_points_passage) temps de passage en secondes
+    tirages: np.ndarray  # (n_tirages,) temps d'arrivée de chaque tirage
+
+
+def _troncons(distances, elevations, points_km, pas_pente):
+    """Pentes des classes (K,) et mètres par tronçon et par classe (n_troncons, K)."""
+    distances = np.asarray(distances, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+    points_km = np.clip(np.sort(np.asarray(points_km, dtype=float)), distances[0], distances[-1])
+    position = np.searchsorted(distances, points_km)
+    distances_p = np.insert(distances, position, points_km)
+    elevations_p = np.insert(elevations, position, np.interp(points_km, distances, elevations))
+    d, slopes = segment_arrays(distances_p, elevations_p)
+    troncon = np.searchsorted(points_km, distances_p[:-1], side="right")
+    n_troncons = len(points_km) + 1
+
+    if pas_pente is None:
+        metres = np.zeros((n_troncons, len(d)))
+        metres[troncon, np.arange(len(d))] = d
+        return slopes, metres
+    classes = np.floor(slopes / pas_pente + 0.5).astype(np.int64)
+    uniques, classe = np.unique(classes, return_inverse=True)
+    k = len(uniques)
+    total = np.bincount(classe, weights=d, minlength=k)
+    centres = np.divide(np.bincount(classe, weights=d * slopes, minlength=k), total,
+                        out=uniques * float(pas_pente), where=total > 0)
+    metres = np.bincount(troncon * k + classe, weights=d, minlength=n_troncons * k).reshape(n_troncons, k)
+    return centres, metres
+
+
+def _bloc(modele, flat_speed, pentes, metres, n, sigmas, graine):
+    """Temps de chaque tronçon (n, n_troncons) pour n tirages."""
+    sigma_vitesse, sigma_plafond, sigma_coeffs = sigmas
+    rng = np.random.default_rng(graine)
+    i = pentes / 100
+    v_plat = flat_speed * np.exp(sigma_vitesse * rng.standard_normal((n, 1)))
+    if modele.coeffs is not None:
+        coeffs = np.asarray(modele.coeffs) * (1 + sigma_coeffs * rng.standard_normal((n, len(modele.coeffs))))
+        cout = np.repeat(coeffs[:, :1], len(i), axis=1)
+        for c in coeffs[:, 1:].T:  # Horner
+            cout *= i
+            cout += c[:, None]
+        plancher = COUT_MIN_RELATIF * modele.coeffs[-1]
+        np.maximum(cout, plancher, out=cout)
+        facteurs = np.maximum(coeffs[:, -1:], plancher) / cout  # C(0) / C(i)
+    else:
+        facteurs = np.broadcast_to(modele._facteurs_sans_plafond(pentes), (n, len(i))).copy()
+    if modele.plafond is not None:
+        plafonds = modele.plafond * np.exp(sigma_plafond * rng.standard_normal((n, 1)))
+        np.minimum(facteurs, plafonds, out=facteurs)
+    vitesses = v_plat * facteurs
+    if modele.vitesse_max is not None:
+        np.minimum(vitesses, modele.vitesse_max, out=vitesses)
+    # même convention que le moteur : un segment à vitesse nulle ne compte pas
+    inverses = np.zeros_like(vitesses)
+    np.divide(1.0, vitesses, out=inverses, where=vitesses > 0)
+    return inverses @ metres.T
+
+
+def distribution_temps(distances, elevations, flat_speed, model="minetti", points_km=(),
+                       n_tirages=N_TIRAGES, sigma_vitesse=SIGMA_VITESSE, sigma_plafond=SIGMA_PLAFOND,
+                       sigma_coeffs=SIGMA_COEFFS, quantiles=QUANTILES, pas_pente=PAS_PENTE,
+                       graine=None, memoire_max=MEMOIRE_MAX, processus=1):
+    """
+    Percentiles du temps d'arrivée et des temps de passage.
+
+    Args:
+        distances (list of float): Distances cumulées en km.
+        elevations (list of float): Altitudes correspondantes en mètres.
+        flat_speed (float): Vitesse sur plat centrale en m/s (ex. trouver_vitesse_plate).
+        model (str or ModeleCout): Modèle de coût.
+        points_km (array of float): Distances des points de passage (km).
+        n_tirages (int): Nombre de tirages.
+        sigma_vitesse, sigma_plafond, sigma_coeffs (float): Incertitudes relatives (voir l'en-tête).
+        quantiles (tuple): Percentiles renvoyés.
+        pas_pente (float): Largeur des classes de pente en % (None : segments exacts).
+        graine (int): Graine du générateur aléatoire.
+        memoire_max (int): Taille maximale en octets des tableaux d'un bloc de tirages.
+        processus (int): Nombre de processus (1 : calcul dans le processus courant).
+
+    Returns:
+        DistributionTemps
+    """
+    modele = get_modele(model)
+    pentes, metres = _troncons(distances, elevations, points_km, pas_pente)
+    taille_bloc = max(1, min(n_tirages, memoire_max // (8 * 4 * max(len(pentes), 1))))
+    tailles = [min(taille_bloc, n_tirages - debut) for debut in range(0, n_tirages, taille_bloc)]
+    graines = np.random.SeedSequence(graine).spawn(len(tailles))
+    sigmas = (sigma_vitesse, sigma_plafond, sigma_coeffs)
+    args = [(modele, flat_speed, pentes, metres, n, sigmas, g) for n, g in zip(tailles, graines)]
+
+    if processus > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=processus) as pool:
+            blocs = list(pool.map(_bloc, *zip(*args)))
+    else:
+        blocs = [_bloc(*a) for a in args]
+
+    cumules = np.cumsum(np.concatenate(blocs), axis=1)  # (n_tirages, n_troncons)
+    percentiles = np.percentile(cumules, quantiles, axis=0)
+    return DistributionTemps(tuple(quantiles), percentiles[:, -1], percentiles[:, :-1], cumules[:, -1])
@@ -0,0 +1,116 @@
+"""
+Instrumentation légère des étapes du calcul (désactivée par défaut).
+
+Activation : variable d'environnement SIMULATEUR_PROFILING=1 pour tout le processus, ou
+activer() pour l'exécution en cours (par exemple un rerun Streamlit avec ?debug=1).
+Chaque étape mesurée produit un enregistrement {etape, niveau, duree_ms, ...infos} :
+    - gardé dans la liste de l'exécution en cours (demarrer_run() / mesures_run()),
+      affichée dans le panneau de temps de app.py ;
+    - ajouté en JSON lines au fichier SIMULATEUR_PROFILING_FICHIER (profiling.jsonl par défaut)
+      pour agréger les sessions.
+Désactivée, une étape ne coûte qu'une lecture de ContextVar.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+FICHIER = os.environ.get("SIMULATEUR_PROFILING_FICHIER", "profiling.jsonl")
+ACTIF_ENV = os.environ.get("SIMULATEUR_PROFILING", "") not in ("", "0")
+
+_actif = ContextVar("profiling_actif", default=ACTIF_ENV)
+_run = ContextVar("profiling_run", default=None)  # (session, liste des mesures)
+_courante = ContextVar("profiling_etape", default=None)
+_verrou = threading.Lock()
+
+
+def actif():
+    return _actif.get()
+
+
+def activer(valeur=True):
+    """Active (ou désactive) l'instrumentation pour l'exécution en cours."""
+    _actif.set(valeur)
+
+
+def demarrer_run(session=None):
+    """Début d'une exécution (rerun) : les mesures suivantes sont regroupées sous `session`."""
+    mesures = []
+    _run.set((session, mesures))
+    return mesures
+
+
+def mesures_run():
+    """Mesures de l'exécution en cours."""
+    run = _run.get()
+    return run[1] if run is not None else []
+
+
+def _ecrire(mesure):
+    if not FICHIER:
+        return
+    ligne = json.dumps(mesure, ensure_ascii=False, default=str)
+    with _verrou, open(FICHIER, "a", encoding="utf-8") as f:
+        f.write(ligne + "\n")
+
+
+@contextmanager
+def etape(nom, **infos):
+    """Mesure la durée du bloc ; `infos` (nombre de points...) est ajouté à l'enregistrement."""
+    if not _actif.get():
+        yield None
+        return
+    parent = _courante.get()
+    mesure = {"etape": nom, "niveau": 0 if parent is None else parent["niveau"] + 1, **infos}
+    run = _run.get()
+    if run is not None:
+        mesure["session"] = run[0]
+        run[1].append(mesure)  # ajoutée au début : les mesures restent dans l'ordre d'exécution
+    jeton = _courante.set(mesure)
+    debut = time.perf_counter()
+    try:
+        yield mesure
+    finally:
+        mesure["duree_ms"] = round((time.perf_counter() - debut) * 1000, 3)
+        mesure["horodatage"] = time.time()
+        _courante.reset(jeton)
+        _ecrire(mesure)
+
+
+def noter(**infos):
+    """Ajoute des informations (itérations, hit de cache...) à l'étape en cours."""
+    if _actif.get():
+        mesure = _courante.get()
+        if mesure is not None:
+            mesure.update(infos)
+
+
+def profile(nom=None, points=None):
+    """
+    Décorateur : mesure chaque appel de la fonction comme une étape.
+
+    Args:
+        nom (str): nom de l'étape (nom de la fonction par défaut).
+        points (str): nom de l'argument dont la longueur est notée comme nombre de points.
+    """
+    def decorateur(fonction):
+        signature = inspect.signature(fonction)
+        nom_etape = nom or fonction.__name__
+
+        @functools.wraps(fonction)
+        def wrapper(*args, **kwargs):
+            if not _actif.get():
+                return fonction(*args, **kwargs)
+            infos = {}
+            if points is not None:
+                valeur = signature.bind_partial(*args, **kwargs).arguments.get(points)
+                if hasattr(valeur, "__len__"):
+                    infos["points"] = len(valeur)
+            with etape(nom_etape, **infos):
+                return fonction(*args, **kwargs)
+        return wrapper
+    return decorateur
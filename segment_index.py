@@ -0,0 +1,59 @@
+"""
+Statistiques d'un tronçon [start_km, end_km] en O(log n).
+
+Distance, temps par modèle, D+ et D- sont stockés sous forme de sommes cumulées : les points
+du tronçon sont trouvés par recherche dichotomique dans distances_pace, puis chaque grandeur
+est une différence de deux valeurs cumulées. Mêmes conventions que le calcul point par point
+de app.py (points dont distances_pace est dans l'intervalle, D+/D- sur elevations[i0+1:i1+2]).
+"""
+import numpy as np
+
+
+class IndexSegments:
+
+    def __init__(self, distances_pace, elevations, temps_cumules):
+        """
+        Args:
+            distances_pace (list of float): Distances intermédiaires en km (croissantes).
+            elevations (list of float): Altitudes en mètres.
+            temps_cumules (dict): {nom du modèle: temps cumulés en secondes}.
+        """
+        self.distances_pace = np.asarray(distances_pace, dtype=float)
+        self.temps_cumules = {m: np.asarray(t, dtype=float) for m, t in temps_cumules.items()}
+        dz = np.diff(np.asarray(elevations, dtype=float))
+        self._d_plus = np.concatenate(([0.0], np.cumsum(np.where(dz > 0, dz, 0))))
+        self._d_moins = np.concatenate(([0.0], np.cumsum(np.where(dz > 0, 0, dz))))
+
+    def bornes(self, start_km, end_km):
+        """Indices (i0, i1) du premier et du dernier point du tronçon (i1 < i0 si vide)."""
+        i0 = np.searchsorted(self.distances_pace, start_km, side="left")
+        i1 = np.searchsorted(self.distances_pace, end_km, side="right") - 1
+        return i0, i1
+
+    def stats(self, start_km, end_km):
+        """
+        Statistiques du tronçon, ou None s'il contient moins de 2 points.
+
+        start_km et end_km peuvent être des tableaux (plusieurs tronçons d'un coup) ;
+        les tronçons de moins de 2 points ont alors des valeurs NaN.
+
+        Returns:
+            dict: distance (km), d_plus / d_moins (m) et temps (dict {modèle: secondes}).
+        """
+        i0, i1 = self.bornes(start_km, end_km)
+        valide = i1 - i0 >= 1
+        if np.ndim(valide) == 0 and not valide:
+            return None
+        i0 = np.where(valide, i0, 0)
+        i1 = np.where(valide, i1, 0)
+
+        def masque(x):
+            return np.where(valide, x, np.nan) if np.ndim(valide) else float(x)
+
+        # D+ / D- sur elevations[i0+1 : i1+2], soit les dénivelés entre les points i0+1 et i1+1
+        return {
+            "distance": masque(self.distances_pace[i1] - self.distances_pace[i0]),
+            "d_plus": masque(self._d_plus[i1 + 1] - self._d_plus[i0 + 1]),
+            "d_moins": masque(self._d_moins[i1 + 1] - self._d_moins[i0 + 1]),
+            "temps": {m: masque(t[i1] - t[i0]) for m, t in self.temps_cumules.items()},
+        }
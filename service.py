@@ -0,0 +1,320 @@
+"""
+Service HTTP (JSON) du simulateur, indépendant de Streamlit.
+
+Serveur asyncio de la bibliothèque standard ; les calculs (lecture du GPX, solveurs, temps
+de passage) tournent dans un pool de processus pour que la boucle d'événements reste
+disponible pendant les requêtes concurrentes. Le moteur est celui de utils.py et les
+parcours sont partagés entre les processus par le cache disque (course_cache.py).
+
+Routes :
+    GET  /sante      -> {"ok": true}
+    POST /parcours   corps : GPX, TCX, FIT ou GeoJSON (brut ou multipart/form-data), format
+                     reconnu au contenu (voir formats.py)
+                     -> {"parcours": identifiant, "distance_km", "d_plus", "d_moins", "points"}
+    POST /allures    corps JSON : {"gpx": "<gpx ...>" ou "parcours": identifiant,
+                                   "temps": ["06:15:30", 22000, ...], "modeles": ["minetti", "strava"],
+                                   "pas_split_km": 1, "segments": true, "lissage": null, "fenetre_lissage": 100}
+                     ("gpx" peut aussi être un texte TCX ou un objet GeoJSON)
+                     ou corps du fichier (tout format, FIT compris) avec les mêmes options en paramètres d'URL
+                     (?temps=06:15:30,07:00:00&modeles=minetti)
+                     Au plus N_TEMPS_MAX temps par requête, pas_split_km >= PAS_SPLIT_MIN_KM.
+                     -> allure sur plat, splits, temps aux points de passage (waypoints du GPX)
+                        et allures par segment pour chaque (modèle, temps)
+
+Usage :
+    python service.py --port 8000 -j 4
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from checkpoints import points_passage, temps_aux_distances
+from course_cache import cache_defaut
+from smoothing import FENETRE_LISSAGE, lisser
+from utils import (
+    calculate_deniv,
+    compute_cumulative_time,
+    compute_paces,
+    format_time,
+    trouver_vitesse_plate,
+    vitesse_to_allure,
+)
+
+TAILLE_MAX_CORPS = 50 * 1024**2  # octets
+PAS_SPLIT_KM = 1.0
+PAS_SPLIT_MIN_KM = 0.1  # borne le nombre de splits renvoyés
+N_TEMPS_MAX = 20  # temps espérés par requête
+MESSAGES = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ErreurRequete(Exception):
+    """Erreur renvoyée au client avec un statut HTTP."""
+
+    def __init__(self, statut, message):
+        super().__init__(statut, message)
+        self.statut = statut
+        self.message = message
+
+
+def _secondes(temps):
+    """Temps espéré en secondes (nombre fini > 0) depuis un nombre ou "hh:mm:ss"."""
+    if isinstance(temps, bool):
+        secondes = math.nan
+    elif isinstance(temps, (int, float)) or str(temps).replace(".", "", 1).isdigit():
+        secondes = float(temps)
+    else:
+        try:
+            h, m, s = map(int, str(temps).split(":"))
+        except ValueError:
+            raise ErreurRequete(400, f"Temps invalide : {temps} (hh:mm:ss ou secondes)") from None
+        secondes = float(h * 3600 + m * 60 + s)
+    if not (math.isfinite(secondes) and secondes > 0):
+        raise ErreurRequete(400, f"Temps invalide : {temps} (durée positive attendue)")
+    return secondes
+
+
+def _booleen(valeur, nom):
+    """Booléen JSON ou texte de paramètre d'URL ("0", "false" et "non" valent faux)."""
+    if isinstance(valeur, bool):
+        return valeur
+    if isinstance(valeur, str) and valeur.lower() in ("1", "true", "oui", "0", "false", "non"):
+        return valeur.lower() not in ("0", "false", "non")
+    raise ErreurRequete(400, f"Paramètre invalide : {nom}={valeur} (booléen attendu)")
+
+
+## -- CALCULS (exécutés dans le pool de processus) --
+
+def _charger(gpx=None, parcours=None):
+    cache = cache_defaut()
+    if gpx is not None:
+        return cache.cle_parcours(gpx), cache.charger_parcours(gpx)
+    try:
+        return parcours, cache.par_cle(parcours)
+    except KeyError:
+        raise ErreurRequete(404, f"Parcours inconnu ou expiré : {parcours}") from None
+
+
+def enregistrer_parcours(gpx):
+    """Analyse et met en cache un GPX ; renvoie son identifiant et son résumé."""
+    cle, v = _charger(gpx=gpx)
+    if len(v["distances"]) < 2:
+        raise ErreurRequete(400, "Pas assez de points de trace")
+    d_plus, d_moins = calculate_deniv(v["elevations"])
+    return {"parcours": cle, "distance_km": float(v["distances"][-1]), "d_plus": d_plus,
+            "d_moins": d_moins, "points": len(v["distances"])}
+
+
+def _splits(distances, cumulative_time, pas_km):
+    """Temps et allure de chaque tranche de pas_km km (la dernière peut être plus courte)."""
+    bornes = np.append(np.arange(pas_km, distances[-1], pas_km), distances[-1])
+    temps = np.interp(bornes, distances, cumulative_time)
+    longueurs = np.diff(bornes, prepend=0.0) * 1000
+    durees = np.diff(temps, prepend=0.0)
+    return [{"km": round(float(b), 3), "temps": format_time(t), "temps_sec": round(float(t), 1),
+             "duree": format_time(dt), "allure": vitesse_to_allure(l / dt) if dt > 0 else "∞"}
+            for b, t, l, dt in zip(bornes, temps, longueurs, durees)]
+
+
+def calculer_allures(gpx=None, parcours=None, temps=(), modeles=("minetti", "strava"),
+                     pas_split_km=PAS_SPLIT_KM, segments=True, lissage=None,
+                     fenetre_lissage=FENETRE_LISSAGE):
+    """Réponse de /allures : allure sur plat, splits et allures par segment."""
+    if not pas_split_km >= PAS_SPLIT_MIN_KM:
+        raise ErreurRequete(400, f"pas_split_km doit être au moins {PAS_SPLIT_MIN_KM}")
+    if len(temps) > N_TEMPS_MAX:
+        raise ErreurRequete(400, f"Au plus {N_TEMPS_MAX} temps espérés par requête")
+    cle, v = _charger(gpx, parcours)
+    distances = v["distances"]
+    if len(distances) < 2:
+        raise ErreurRequete(400, "Pas assez de points de trace")
+    elevations = v["elevations"] if lissage is None else lisser(distances, v["elevations"],
+                                                                 lissage, fenetre_lissage)
+    d_plus, d_moins = calculate_deniv(elevations)
+    reponse = {"parcours": cle, "distance_km": float(distances[-1]), "d_plus": d_plus,
+               "d_moins": d_moins, "resultats": []}
+    points = points_passage(v)
+    if len(points.noms):
+        reponse["points_passage"] = [{"nom": str(nom), "km": round(float(km), 3)}
+                                     for nom, km in zip(points.noms, points.distances)]
+    if segments:
+        reponse["distances_segments_km"] = ((distances[1:] + distances[:-1]) / 2).round(4).tolist()
+
+    for model in modeles:
+        for t in temps:
+            flat_speed = trouver_vitesse_plate(distances, elevations, t, model=model)
+            cumulative_time = np.asarray(compute_cumulative_time(flat_speed, distances, elevations, model))
+            resultat = {"modele": model, "temps_espere": format_time(t), "vitesse_plate": round(flat_speed, 4),
+                        "allure_plate": vitesse_to_allure(flat_speed),
+                        "splits": _splits(distances, cumulative_time, pas_split_km)}
+            if len(points.noms):
+                resultat["passages"] = [format_time(t) for t in
+                                        temps_aux_distances(points.distances, distances, cumulative_time)]
+            if segments:
+                resultat["allures_segments"] = compute_paces(distances, elevations, flat_speed, model)
+            reponse["resultats"].append(resultat)
+    return reponse
+
+
+## -- HTTP --
+
+def _fichier_multipart(content_type, corps):
+    """Contenu du premier fichier d'un corps multipart/form-data."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + corps)
+    for partie in message.iter_parts():
+        if partie.get_filename() or partie.get_param("name", header="content-disposition") == "gpx":
+            return partie.get_payload(decode=True)
+    raise ErreurRequete(400, "Aucun fichier dans le formulaire")
+
+
+def _gpx_du_corps(entetes, corps):
+    content_type = entetes.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        corps = _fichier_multipart(content_type, corps)
+    if not corps:
+        raise ErreurRequete(400, "Corps vide : fichier GPX attendu")
+    return corps
+
+
+def _options_allures(requete, entetes, corps):
+    """Arguments de calculer_allures depuis un corps JSON ou un GPX + paramètres d'URL."""
+    if entetes.get("content-type", "").startswith("application/json"):
+        try:
+            options = json.loads(corps or b"{}")
+        except ValueError:
+            raise ErreurRequete(400, "JSON invalide") from None
+        if not isinstance(options, dict):
+            raise ErreurRequete(400, "Objet JSON attendu")
+        gpx = options.get("gpx")
+        if isinstance(gpx, dict):  # objet GeoJSON
+            gpx = json.dumps(gpx)
+        options["gpx"] = gpx.encode("utf-8") if isinstance(gpx, str) else None
+    else:
+        params = parse_qs(requete.query)
+        options = {k: ",".join(v).split(",") for k, v in params.items()}
+        options = {k: (v if k in ("temps", "modeles") else v[0]) for k, v in options.items()}
+        options["gpx"] = _gpx_du_corps(entetes, corps) if corps else None
+
+    if options["gpx"] is None and not options.get("parcours"):
+        raise ErreurRequete(400, "Fournir un GPX ou un identifiant de parcours")
+    temps = options.get("temps")
+    if not temps:
+        raise ErreurRequete(400, "Au moins un temps espéré est requis")
+    modeles = options.get("modeles") or ("minetti", "strava")
+    try:
+        return {
+            "gpx": options["gpx"],
+            "parcours": options.get("parcours"),
+            "temps": [_secondes(t) for t in (temps if isinstance(temps, list) else [temps])],
+            "modeles": [modeles] if isinstance(modeles, str) else list(modeles),
+            "pas_split_km": float(options.get("pas_split_km", PAS_SPLIT_KM)),
+            "segments": _booleen(options.get("segments", True), "segments"),
+            "lissage": options.get("lissage"),
+            "fenetre_lissage": float(options.get("fenetre_lissage", FENETRE_LISSAGE)),
+        }
+    except (TypeError, ValueError) as e:
+        raise ErreurRequete(400, f"Paramètre invalide : {e}") from None
+
+
+async def _executer(pool, fonction, **kwargs):
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, _appel, fonction, kwargs)
+    except ValueError as e:  # modèle ou méthode de lissage inconnus, GPX illisible...
+        raise ErreurRequete(400, str(e)) from None
+
+
+def _appel(fonction, kwargs):
+    return fonction(**kwargs)
+
+
+async def _router(methode, requete, entetes, corps, pool):
+    if requete.path == "/sante":
+        return {"ok": True}
+    if requete.path not in ("/parcours", "/allures"):
+        raise ErreurRequete(404, f"Route inconnue : {requete.path}")
+    if methode != "POST":
+        raise ErreurRequete(405, "POST attendu")
+    if requete.path == "/parcours":
+        return await _executer(pool, enregistrer_parcours, gpx=_gpx_du_corps(entetes, corps))
+    return await _executer(pool, calculer_allures, **_options_allures(requete, entetes, corps))
+
+
+async def _connexion(reader, writer, pool):
+    statut, reponse = 200, None
+    try:
+        ligne = await reader.readline()
+        if not ligne:
+            return
+        try:
+            methode, cible, _ = ligne.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ErreurRequete(400, "Requête invalide") from None
+        entetes = {}
+        while True:
+            ligne = await reader.readline()
+            if ligne in (b"\r\n", b"\n", b""):
+                break
+            nom, _, valeur = ligne.decode("latin-1").partition(":")
+            entetes[nom.strip().lower()] = valeur.strip()
+        try:
+            taille = int(entetes.get("content-length") or 0)
+        except ValueError:
+            raise ErreurRequete(400, "Content-Length invalide") from None
+        if taille < 0:
+            raise ErreurRequete(400, "Content-Length invalide")
+        if taille > TAILLE_MAX_CORPS:
+            raise ErreurRequete(413, f"Corps limité à {TAILLE_MAX_CORPS} octets")
+        corps = await reader.readexactly(taille) if taille else b""
+        reponse = await _router(methode.upper(), urlsplit(cible), entetes, corps, pool)
+    except ErreurRequete as e:
+        statut, reponse = e.statut, {"erreur": e.message}
+    except (asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+        return
+    except Exception as e:
+        statut, reponse = 500, {"erreur": f"{type(e).__name__}: {e}"}
+
+    donnees = json.dumps(reponse, ensure_ascii=False).encode("utf-8")
+    writer.write(f"HTTP/1.1 {statut} {MESSAGES[statut]}\r\n"
+                 "Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(donnees)}\r\n"
+                 "Connection: close\r\n\r\n".encode("latin-1") + donnees)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def servir(hote="127.0.0.1", port=8000, processus=None):
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        serveur = await asyncio.start_server(lambda r, w: _connexion(r, w, pool), hote, port)
+        print(f"Service en écoute sur http://{hote}:{port}", file=sys.stderr)
+        async with serveur:
+            await serveur.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("-j", "--processus", type=int, default=os.cpu_count(), help="taille du pool")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.hote, args.port, args.processus))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
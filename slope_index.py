@@ -0,0 +1,107 @@
+"""
+Index des pentes d'un parcours : mètres parcourus par classe de pente.
+
+À vitesse sur plat donnée, le temps total ne dépend que du nombre de mètres parcourus
+à chaque pente. Les segments sont regroupés en classes de largeur `pas` (en %), chaque
+classe étant représentée par la pente moyenne de ses segments pondérée par leur longueur :
+une simulation coûte alors O(classes) au lieu de O(points). Les segments exacts sont
+conservés, triés par classe, pour pouvoir raffiner le calcul.
+
+Borne d'erreur : en notant g(s) = 1 / v(s) le temps par mètre à la pente s,
+    |T_index - T_exact| <= somme_b m_b * max_{s dans [s_min_b, s_max_b]} |g(s) - g(c_b)|
+où m_b est la longueur de la classe b, c_b sa pente représentative et [s_min_b, s_max_b]
+les pentes extrêmes des segments de la classe (inclus dans une largeur `pas`).
+Cette borne décroît linéairement avec le pas (<= pas * somme_b m_b max|g'|) ; c'est un pire
+cas : comme c_b est la moyenne pondérée, les termes du premier ordre se compensent dans
+chaque classe et l'erreur observée est en pratique bien plus faible (ordre pas^2 là où g
+est dérivable). borne_erreur() évalue cette borne pour régler le pas.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from solver import temps_parcours
+
+PAS_PENTE = 0.5  # largeur par défaut d'une classe de pente en %
+
+
+@dataclass
+class IndexPentes:
+    pas: float  # largeur des classes en %
+    centres: np.ndarray  # pente représentative de chaque classe non vide (%)
+    metres: np.ndarray  # mètres parcourus dans chaque classe
+    d: np.ndarray  # longueurs exactes des segments (m), triées par classe
+    slopes: np.ndarray  # pentes exactes des segments (%), triées par classe
+    debuts: np.ndarray  # segments de la classe b : d[debuts[b]:debuts[b+1]]
+
+
+def construire_index_pentes(d, slopes, pas=PAS_PENTE):
+    """
+    Construit l'index des pentes à partir des segments du parcours.
+
+    Args:
+        d (np.ndarray): Longueurs des segments en mètres.
+        slopes (np.ndarray): Pentes des segments en %.
+        pas (float): Largeur d'une classe de pente en %.
+
+    Returns:
+        IndexPentes: seules les classes non vides sont stockées.
+    """
+    d = np.asarray(d, dtype=float)
+    slopes = np.asarray(slopes, dtype=float)
+    classes = np.floor(slopes / pas + 0.5).astype(np.int64)
+    ordre = np.argsort(classes, kind="stable")
+    classes = classes[ordre]
+    uniques, debuts = np.unique(classes, return_index=True)
+    debuts = np.append(debuts, len(classes))
+    d = d[ordre]
+    slopes = slopes[ordre]
+    if not len(d):
+        return IndexPentes(pas, np.zeros(0), np.zeros(0), d, slopes, debuts)
+    metres = np.add.reduceat(d, debuts[:-1])
+    # pente représentative : moyenne pondérée par la longueur (centre de la classe si longueur nulle)
+    moments = np.add.reduceat(d * slopes, debuts[:-1])
+    centres = uniques * pas
+    np.divide(moments, metres, out=centres, where=metres > 0)
+    return IndexPentes(pas, centres, metres, d, slopes, debuts)
+
+
+def temps_total_index(speeds_fn, flat_speed, index):
+    """Temps total (s) estimé à partir des classes de pente : O(classes)."""
+    return temps_parcours(speeds_fn, flat_speed, index.metres, index.centres)
+
+
+def raffiner(speeds_fn, flat_speed, index, classes=None):
+    """
+    Temps exact (s) à partir des segments conservés dans l'index.
+
+    Args:
+        classes (array of int, optional): indices des classes à raffiner ; les autres
+            restent estimées par leur pente représentative. Par défaut, toutes les classes.
+    """
+    if classes is None:
+        return temps_parcours(speeds_fn, flat_speed, index.d, index.slopes)
+    exactes = np.zeros(len(index.metres), dtype=bool)
+    exactes[classes] = True
+    par_segment = np.repeat(exactes, np.diff(index.debuts))
+    t_exact = temps_parcours(speeds_fn, flat_speed, index.d[par_segment], index.slopes[par_segment])
+    return t_exact + temps_parcours(speeds_fn, flat_speed, index.metres[~exactes], index.centres[~exactes])
+
+
+def borne_erreur(speeds_fn, flat_speed, index, echantillons=9):
+    """
+    Borne de |temps_total_index - temps exact| en secondes (voir l'en-tête du module).
+
+    Le maximum de |g(s) - g(c_b)| est évalué sur `echantillons` pentes réparties entre les
+    pentes extrêmes de chaque classe (exact si g est monotone sur la classe).
+    """
+    if len(index.metres) == 0:
+        return 0.0
+    s_min = np.minimum.reduceat(index.slopes, index.debuts[:-1])
+    s_max = np.maximum.reduceat(index.slopes, index.debuts[:-1])
+    s = np.linspace(s_min, s_max, echantillons)  # (echantillons, classes)
+    with np.errstate(divide="ignore"):
+        g = 1 / speeds_fn(flat_speed, s)
+        g_centre = 1 / speeds_fn(flat_speed, index.centres)
+    ecart = np.max(np.abs(g - g_centre), axis=0)
+    return float(np.sum(index.metres * ecart))
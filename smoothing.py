@@ -0,0 +1,76 @@
+"""
+Lissage de l'altitude en fonction de la distance.
+
+Le bruit GPS sur l'altitude gonfle le D+ et ajoute des à-coups aux pentes des segments.
+Toutes les méthodes prennent une fenêtre en mètres (et non en nombre de points) et
+travaillent sur le tableau entier en O(n) :
+    - "moyenne" : moyenne des points à moins de fenetre/2, par sommes cumulées ;
+    - "gaussien" : 3 moyennes glissantes successives de largeur fenetre/2, soit une
+      gaussienne d'écart-type fenetre/4 ;
+    - "savgol" : Savitzky-Golay (polynôme de degré 2) sur une grille régulière, puis
+      réinterpolé aux distances d'origine. Le pas de la grille est au moins fenetre/POINTS_SAVGOL,
+      le filtre a donc au plus POINTS_SAVGOL + 1 coefficients et la convolution reste en O(n).
+"""
+import numpy as np
+
+FENETRE_LISSAGE = 100  # mètres
+METHODES_LISSAGE = ("moyenne", "gaussien", "savgol")
+POINTS_SAVGOL = 50  # points de grille par fenêtre au plus (borne le coût et la taille de la grille)
+
+
+def moyenne_glissante(x, y, fenetre):
+    """Moyenne de y sur les points dont l'abscisse x (m) est à moins de fenetre/2."""
+    cumul = np.concatenate(([0.0], np.cumsum(y)))
+    gauche = np.searchsorted(x, x - fenetre / 2, side="left")
+    droite = np.searchsorted(x, x + fenetre / 2, side="right")
+    return (cumul[droite] - cumul[gauche]) / (droite - gauche)
+
+
+def gaussien(x, y, fenetre):
+    """Approximation gaussienne (écart-type fenetre/4) par 3 moyennes glissantes."""
+    for _ in range(3):
+        y = moyenne_glissante(x, y, fenetre / 2)
+    return y
+
+
+def savitzky_golay(x, y, fenetre, ordre=2):
+    """Savitzky-Golay sur une grille régulière au pas médian des points (au moins fenetre/POINTS_SAVGOL)."""
+    if len(x) < 2 or x[-1] <= x[0] or fenetre <= 0:
+        return y.copy()
+    # un pas médian nul (points dupliqués) ou minuscule avec un long trou ferait une grille énorme
+    pas = max(float(np.median(np.diff(x))), fenetre / POINTS_SAVGOL)
+    demi = max(ordre // 2 + 1, int(fenetre / pas) // 2)
+    grille = np.arange(x[0], x[-1] + pas / 2, pas)
+    y_grille = np.interp(grille, x, y)
+    # coefficients du filtre : valeur en 0 du polynôme des moindres carrés sur la fenêtre
+    vander = np.vander(np.arange(-demi, demi + 1), ordre + 1, increasing=True)
+    coeffs = np.linalg.pinv(vander)[0]
+    etendu = np.concatenate((np.full(demi, y_grille[0]), y_grille, np.full(demi, y_grille[-1])))
+    lisse = np.convolve(etendu, coeffs[::-1], mode="valid")
+    return np.interp(x, grille, lisse)
+
+
+def lisser(distances, elevations, methode="moyenne", fenetre=FENETRE_LISSAGE):
+    """
+    Lisse les altitudes.
+
+    Args:
+        distances (array of float): Distances cumulées en km.
+        elevations (array of float): Altitudes en mètres.
+        methode (str): "moyenne", "gaussien" ou "savgol" (None : pas de lissage).
+        fenetre (float): Largeur de la fenêtre en mètres.
+
+    Returns:
+        np.ndarray: altitudes lissées.
+    """
+    x = np.asarray(distances, dtype=float) * 1000
+    y = np.asarray(elevations, dtype=float)
+    if methode is None or len(y) < 3:
+        return y.copy()
+    if methode == "moyenne":
+        return moyenne_glissante(x, y, fenetre)
+    if methode == "gaussien":
+        return gaussien(x, y, fenetre)
+    if methode == "savgol":
+        return savitzky_golay(x, y, fenetre)
+    raise ValueError(f"Méthode de lissage inconnue : {methode}")
@@ -0,0 +1,104 @@
+"""
+Solveur de la vitesse sur plat (VAP) correspondant à un temps espéré.
+
+Le temps d'un parcours s'écrit T(v) = somme(d_i / v_i(v)) où v_i est la vitesse
+ajustée à la pente du segment i. Pour les modèles Minetti et Strava, v_i(v) = v * f(pente_i)
+(le plafond de Minetti est lui aussi proportionnel : min(1.3*v, v*C0/Ci) = v*min(1.3, C0/Ci)),
+donc T(v) = T(1) / v et la VAP a une forme fermée : v = T(1) / temps_espere.
+
+Pour un modèle qui ne serait pas homogène (plafond absolu en m/s par exemple), la forme
+fermée sert de point de départ à une méthode de Newton protégée par un encadrement
+(on retombe sur la dichotomie si le pas de Newton sort de l'intervalle).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+V_MIN = 1.0  # m/s
+V_MAX = 6.0  # m/s
+
+
+@dataclass
+class ResultatSolveur:
+    vitesse: float  # vitesse sur plat en m/s
+    temps: float  # temps simulé à cette vitesse en secondes
+    iterations: int  # itérations de Newton / dichotomie (0 pour la forme fermée)
+    evaluations: int  # nombre de passages sur le parcours
+    methode: str  # "forme_fermee" ou "newton"
+
+
+def temps_parcours(speeds_fn, flat_speed, d, slopes):
+    """
+    Temps total (s) sur des segments déjà calculés.
+
+    Args:
+        speeds_fn (callable): vitesses ajustées vectorisées (flat_speed, slopes) -> np.ndarray.
+        flat_speed (float): Vitesse sur plat en m/s.
+        d (np.ndarray): Longueurs des segments en mètres.
+        slopes (np.ndarray): Pentes des segments en %.
+    """
+    v_adj = speeds_fn(flat_speed, slopes)
+    mask = v_adj != 0
+    return float(np.sum(d[mask] / v_adj[mask]))
+
+
+def _temps_et_derivee(speeds_fn, flat_speed, d, slopes, h=1e-6):
+    """Temps total et dT/dv en un seul passage (dérivée de v_i par différence finie)."""
+    v_adj = speeds_fn(flat_speed, slopes)
+    dv_adj = (speeds_fn(flat_speed * (1 + h), slopes) - v_adj) / (flat_speed * h)
+    mask = v_adj != 0
+    t = d[mask] / v_adj[mask]
+    return float(np.sum(t)), float(-np.sum(t / v_adj[mask] * dv_adj[mask]))
+
+
+def resoudre_vitesse_plate(speeds_fn, d, slopes, temps_espere_sec, precision=1,
+                           v_min=V_MIN, v_max=V_MAX, max_iter=100):
+    """
+    Trouve la vitesse sur plat donnant le temps espéré.
+
+    Args:
+        speeds_fn (callable): vitesses ajustées vectorisées (flat_speed, slopes) -> np.ndarray.
+        d (np.ndarray): Longueurs des segments en mètres.
+        slopes (np.ndarray): Pentes des segments en %.
+        temps_espere_sec (float): Temps total espéré en secondes.
+        precision (float): Précision souhaitée en secondes.
+        v_min, v_max (float): Encadrement utilisé si la forme fermée ne convient pas.
+        max_iter (int): Nombre maximal d'itérations de Newton.
+
+    Returns:
+        ResultatSolveur: vitesse trouvée, temps correspondant, itérations et évaluations.
+    """
+    # Forme fermée : T(v) = T(1) / v pour un modèle homogène, vérifiée par une 2e évaluation
+    t_ref = temps_parcours(speeds_fn, 1.0, d, slopes)
+    evaluations = 1
+    v = t_ref / temps_espere_sec if t_ref > 0 and temps_espere_sec > 0 else (v_min + v_max) / 2
+    t = temps_parcours(speeds_fn, v, d, slopes)
+    evaluations += 1
+    if abs(t - temps_espere_sec) < precision:
+        return ResultatSolveur(v, t, 0, evaluations, "forme_fermee")
+
+    # Newton protégé par l'encadrement [lo, hi] (T décroît quand v augmente)
+    lo, hi = v_min, v_max
+    v = min(max(v, lo), hi)
+    iterations = 0
+    while iterations < max_iter and hi - lo > 0.0001:
+        iterations += 1
+        t, dt = _temps_et_derivee(speeds_fn, v, d, slopes)
+        evaluations += 1
+        ecart = t - temps_espere_sec
+        if abs(ecart) < precision:
+            return ResultatSolveur(v, t, iterations, evaluations, "newton")
+
+        if ecart > 0:
+            lo = v  # Temps trop long -> aller plus vite
+        else:
+            hi = v  # Temps trop court -> aller moins vite
+
+        v_newton = v - ecart / dt if dt < 0 else None
+        if v_newton is not None and lo < v_newton < hi:
+            v = v_newton
+        else:
+            v = (lo + hi) / 2  # repli sur la dichotomie
+
+    v = (lo + hi) / 2
+    return ResultatSolveur(v, temps_parcours(speeds_fn, v, d, slopes), iterations, evaluations + 1, "newton")
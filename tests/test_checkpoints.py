@@ -0,0 +1,49 @@
+import numpy as np
+
+from checkpoints import caler_waypoints
+
+METRES_PAR_DEGRE = 111_319.5
+
+
+def aller_retour(longueur=5000, pas=10):
+    """Trace nord-sud : aller sur `longueur` mètres puis retour par le même chemin."""
+    aller = np.arange(0, longueur + pas, pas, dtype=float)
+    metres = np.concatenate((aller, aller[-2::-1]))
+    lats = 45.0 + metres / METRES_PAR_DEGRE
+    lons = np.full(len(lats), 6.0)
+    distances = np.arange(len(lats)) * pas / 1000
+    return lats, lons, distances
+
+
+def boucle(rayon=1000, n=600):
+    """Cercle fermé : le dernier point revient sur le premier."""
+    angles = np.linspace(0, 2 * np.pi, n)
+    lats = 45.0 + rayon * np.sin(angles) / METRES_PAR_DEGRE
+    lons = 6.0 + rayon * (1 - np.cos(angles)) / (METRES_PAR_DEGRE * np.cos(np.radians(45.0)))
+    distances = np.concatenate(([0.0], np.cumsum(np.full(n - 1, 2 * np.pi * rayon / (n - 1))))) / 1000
+    return lats, lons, distances
+
+
+def test_boucle_depart_et_arrivee_au_meme_endroit():
+    lats, lons, distances = boucle()
+    points = caler_waypoints([lats[0], lats[0]], [lons[0], lons[0]], lats, lons, distances,
+                             noms=["Depart", "Arrivee"])
+    assert list(points.noms) == ["Depart", "Arrivee"]
+    np.testing.assert_allclose(points.distances, [0.0, distances[-1]], atol=0.03)
+
+
+def test_aller_retour_ravitaillement_utilise_deux_fois():
+    lats, lons, distances = aller_retour()
+    ravito = 45.0 + 2000 / METRES_PAR_DEGRE
+    points = caler_waypoints([ravito, ravito], [6.0, 6.0], lats, lons, distances, noms=["Ravito", "Ravito"])
+    np.testing.assert_allclose(points.distances, [2.0, 8.0], atol=0.03)
+
+
+def test_waypoint_ecarte_ne_deplace_pas_le_curseur():
+    lats, lons, distances = aller_retour()
+    ravito = 45.0 + 2000 / METRES_PAR_DEGRE
+    # "Loin" est à ~1 km de la fin de la trace : ignoré, il ne doit pas envoyer la recherche au bout
+    points = caler_waypoints([ravito, 45.0, ravito], [6.0, 6.013, 6.0], lats, lons, distances,
+                             noms=["Aller", "Loin", "Retour"])
+    assert list(points.noms) == ["Aller", "Retour"]
+    np.testing.assert_allclose(points.distances, [2.0, 8.0], atol=0.03)
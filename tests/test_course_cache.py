@@ -0,0 +1,41 @@
+import glob
+import io
+import os
+
+import numpy as np
+
+from course_cache import CacheParcours
+from utils import charger_course
+
+FICHIER = os.path.join(os.path.dirname(__file__), "donnees", "parcours.gpx")
+
+
+def contenu():
+    with open(FICHIER, "rb") as f:
+        return f.read()
+
+
+def test_memoire_puis_disque(tmp_path):
+    cache = CacheParcours(dossier=str(tmp_path))
+    v = cache.charger_parcours(contenu())
+    assert cache.charger_parcours(contenu()) is v
+    autre = CacheParcours(dossier=str(tmp_path))  # autre processus : lecture du .npz
+    np.testing.assert_array_equal(autre.charger_parcours(contenu())["distances"], v["distances"])
+    assert cache.stats == {"hits_memoire": 1, "hits_disque": 0, "misses": 1}
+    assert autre.stats == {"hits_memoire": 0, "hits_disque": 1, "misses": 0}
+
+
+def test_npz_corrompu_recalcule(tmp_path):
+    v = CacheParcours(dossier=str(tmp_path)).charger_parcours(contenu())
+    for chemin in glob.glob(str(tmp_path / "*.npz")):
+        with open(chemin, "r+b") as f:
+            f.truncate(os.path.getsize(chemin) // 2)
+    cache = CacheParcours(dossier=str(tmp_path))
+    np.testing.assert_array_equal(cache.charger_parcours(contenu())["distances"], v["distances"])
+    assert cache.stats["misses"] == 1
+
+
+def test_fichier_ouvert_avec_cache_et_lissage():
+    sans_cache = charger_course(io.BytesIO(contenu()), lissage="moyenne")
+    avec_cache = charger_course(io.BytesIO(contenu()), cache=CacheParcours(dossier=None), lissage="moyenne")
+    np.testing.assert_array_equal(avec_cache.elevations, sans_cache.elevations)
@@ -0,0 +1,38 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from benchmark import FORMATS
+from formats import detecter_format, lire_parcours, lire_points
+
+FICHIER = os.path.join(os.path.dirname(__file__), "donnees", "parcours.gpx")
+
+
+@pytest.fixture(scope="module")
+def points():
+    with open(FICHIER, "rb") as f:
+        return lire_points(f)
+
+
+@pytest.mark.parametrize("format", FORMATS)
+def test_memes_points_dans_chaque_format(points, format):
+    contenu = FORMATS[format](*points)
+    assert detecter_format(contenu) == format
+    for source in (contenu, io.BytesIO(contenu)):
+        lats, lons, eles = lire_points(source)
+        np.testing.assert_allclose(lats, points[0], atol=1e-6)  # FIT : semi-cercles
+        np.testing.assert_allclose(lons, points[1], atol=1e-6)
+        np.testing.assert_allclose(eles, points[2], atol=0.1)  # FIT : 1/5 m
+
+
+def test_waypoints_du_gpx():
+    with open(FICHIER, "rb") as f:
+        parcours = lire_parcours(f)
+    assert list(parcours["wpt_noms"]) == ["Départ", "Ravito", "Arrivée"]
+
+
+def test_format_inconnu():
+    with pytest.raises(ValueError):
+        lire_points(b"lat;lon\n45;6\n")
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from gpx_stream import decimer, ecart_distance_totale
+
+
+def decimer_boucle(cumul, distance_min):
+    """Décimation gloutonne point par point (référence)."""
+    indices = [0]
+    for k in range(1, len(cumul)):
+        if cumul[k] - cumul[indices[-1]] >= distance_min:
+            indices.append(k)
+    return np.array(indices)
+
+
+@pytest.mark.parametrize("distance_min", [0.5, 3, 30, 1e9])
+def test_decimer_comme_la_boucle(distance_min):
+    rng = np.random.default_rng(0)
+    pas = rng.exponential(5, 5000) * (rng.random(5000) > 0.1)  # points dupliqués compris
+    cumul = np.concatenate(([0.0], np.cumsum(pas)))
+    np.testing.assert_array_equal(decimer(cumul, distance_min), decimer_boucle(cumul, distance_min))
+
+
+def test_decimer_sans_distance_min_garde_tout():
+    np.testing.assert_array_equal(decimer(np.arange(10.0), 0), np.arange(10))
+
+
+def test_ecart_distance_totale_tolerance():
+    lats = 45 + np.arange(200) * 1e-4
+    lons = 6 + np.sin(np.arange(200) / 10) * 1e-4
+    eles = 1000 + np.arange(200.0)
+    assert ecart_distance_totale(lats, lons, eles, "haversine", tolerance=1e-6) < 1e-6
+    with pytest.raises(ValueError):
+        ecart_distance_totale(lats, lons, eles, "haversine", tolerance=1e-15)
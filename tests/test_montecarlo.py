@@ -0,0 +1,18 @@
+import numpy as np
+
+from models import ModeleCout
+from montecarlo import COUT_MIN_RELATIF, distribution_temps
+
+
+def test_cout_negatif_borne_au_plancher():
+    # coût 3.6 + 10 i : négatif sous -36 %, le tronçon à -40 % doit quand même compter
+    modele = ModeleCout.depuis_polynome("lineaire", [10.0, 3.6])
+    distances = np.array([0.0, 1.0, 2.0])
+    elevations = np.array([1000.0, 1000.0, 600.0])  # 1 km à plat puis 1 km à -40 %
+    flat_speed = 3.0
+    resultat = distribution_temps(distances, elevations, flat_speed, model=modele, n_tirages=200,
+                                  sigma_vitesse=0, sigma_plafond=0, sigma_coeffs=0, pas_pente=None, graine=0)
+    plat = 1000 / flat_speed
+    descente = 1000 / (flat_speed / COUT_MIN_RELATIF)
+    np.testing.assert_allclose(resultat.tirages, plat + descente)
+    assert resultat.arrivee[0] > plat
@@ -0,0 +1,161 @@
+"""
+Le moteur vectorisé (utils.py) comparé à l'implémentation d'origine, point par point.
+
+Les fonctions de référence ci-dessous sont celles de utils.py avant la vectorisation
+(boucles Python, gpxpy pour la lecture), recopiées telles quelles à la syntaxe près.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from utils import (
+    calculate_deniv,
+    compute_cumulative_time,
+    compute_paces,
+    process_gpx,
+    simulate_temps_total,
+    trouver_vitesse_plate,
+)
+
+FICHIER = os.path.join(os.path.dirname(__file__), "donnees", "parcours.gpx")
+MODELES = ("minetti", "strava")
+
+
+## -- Référence (boucles d'origine) --
+
+def minetti_cost_running(i):
+    a, b, c, d, e, f = 155.4, -30.4, -43.3, 46.3, 19.5, 3.6
+    return a * i**5 + b * i**4 + c*i**3 + d*i**2 + e*i + f
+
+
+def strava_cost(i):
+    a, b, c, d = -3.32959069, 14.61846764, 3.07428877, 1.03357331
+    return a * i**3 + b * i**2 + c*i + d
+
+
+def adjusted_speed(flat_speed, slope, model):
+    i = slope / 100
+    if model == "minetti":
+        return min(1.3*flat_speed, flat_speed * (minetti_cost_running(0) / minetti_cost_running(i)))
+    return flat_speed*(strava_cost(0)/strava_cost(i))
+
+
+def segments(distances, elevations):
+    for i in range(1, len(distances)):
+        d = (distances[i] - distances[i-1]) * 1000  # mètres
+        dz = elevations[i] - elevations[i-1]
+        slope = (dz / d) * 100 if d != 0 else 0
+        yield d, slope
+
+
+def reference_temps_cumule(flat_speed, distances, elevations, model):
+    cumulative_time = [0.0]
+    for d, slope in segments(distances, elevations):
+        v_adj = adjusted_speed(flat_speed, slope, model)
+        cumulative_time.append(cumulative_time[-1] + d / v_adj if v_adj > 0 else cumulative_time[-1])
+    return cumulative_time
+
+
+def reference_allures(distances, elevations, flat_speed, model):
+    paces = []
+    for d, slope in segments(distances, elevations):
+        v_adj = adjusted_speed(flat_speed, slope, model)
+        paces.append((1000 / v_adj) / 60 if v_adj > 0 else None)
+    return paces
+
+
+def reference_process_gpx(gpx_content):
+    gpxpy = pytest.importorskip("gpxpy")
+    gpx = gpxpy.parse(gpx_content)
+    last_point = None
+    total_distance = 0
+    distances = []
+    elevations = []
+    distance_since_last_save = 0
+    for track in gpx.tracks:
+        for segment in track.segments:
+            for point in segment.points:
+                if last_point is not None:
+                    d = point.distance_3d(last_point) or 0
+                    total_distance += d
+                    distance_since_last_save += d
+                    if distance_since_last_save >= 30:
+                        distances.append(total_distance / 1000)
+                        elevations.append(point.elevation)
+                        distance_since_last_save = 0
+                else:
+                    distances.append(total_distance / 1000)
+                    elevations.append(point.elevation)
+                last_point = point
+    return distances, elevations
+
+
+def reference_deniv(elevations):
+    d_plus, d_moins = 0, 0
+    for i in range(1, len(elevations)):
+        deniv_segment = elevations[i]-elevations[i-1]
+        if deniv_segment > 0:
+            d_plus += deniv_segment
+        else:
+            d_moins += deniv_segment
+    return round(d_plus), round(d_moins)
+
+
+## -- Comparaisons --
+
+@pytest.fixture(scope="module")
+def profil():
+    with open(FICHIER, "rb") as f:
+        contenu = f.read()
+    distances, elevations, _, _ = process_gpx(contenu)
+    return contenu, distances, elevations
+
+
+def test_lecture_comme_gpxpy(profil):
+    contenu, distances, elevations = profil
+    ref_distances, ref_elevations = reference_process_gpx(contenu.decode("utf-8"))
+    assert len(distances) == len(ref_distances)
+    np.testing.assert_allclose(distances, ref_distances, rtol=1e-9)
+    np.testing.assert_array_equal(elevations, ref_elevations)
+
+
+def test_denivele(profil):
+    _, _, elevations = profil
+    assert calculate_deniv(elevations) == reference_deniv(elevations)
+
+
+@pytest.mark.parametrize("model", MODELES)
+def test_temps_cumule(profil, model):
+    _, distances, elevations = profil
+    temps = compute_cumulative_time(3.0, distances, elevations, model)
+    np.testing.assert_allclose(temps, reference_temps_cumule(3.0, distances, elevations, model),
+                               rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize("model", MODELES)
+def test_allures(profil, model):
+    _, distances, elevations = profil
+    allures = compute_paces(distances, elevations, 3.0, model)
+    # facteurs interpolés dans la table compilée du modèle : écart relatif < 1e-7 (voir models.py)
+    np.testing.assert_allclose(allures, reference_allures(distances, elevations, 3.0, model), rtol=1e-6)
+
+
+@pytest.mark.parametrize("model", MODELES)
+def test_segments_de_longueur_nulle_et_plafond(model):
+    # segment nul (pente 0 par convention) et descente à -20 % (plafond 1.3 de Minetti)
+    distances = [0.0, 0.1, 0.1, 0.2, 0.3]
+    elevations = [500.0, 505.0, 505.0, 485.0, 485.0]
+    np.testing.assert_allclose(compute_cumulative_time(2.5, distances, elevations, model),
+                               reference_temps_cumule(2.5, distances, elevations, model), rtol=1e-6)
+    np.testing.assert_allclose(compute_paces(distances, elevations, 2.5, model),
+                               reference_allures(distances, elevations, 2.5, model), rtol=1e-6)
+
+
+@pytest.mark.parametrize("model", MODELES)
+def test_vitesse_plate_forme_fermee(profil, model):
+    _, distances, elevations = profil
+    temps_espere = 3600.0
+    v = trouver_vitesse_plate(distances, elevations, temps_espere, model=model)
+    assert abs(reference_temps_cumule(v, distances, elevations, model)[-1] - temps_espere) < 1
+    assert simulate_temps_total(v, distances, elevations, model=model) == pytest.approx(temps_espere, abs=1)
@@ -1,6 +1,13 @@
-import gpxpy
 import numpy as np
 
+from course import Course
+from gpx_stream import DISTANCE_MIN
+from models import get_modele, minetti_cost_running, strava_cost
+from profiling import noter, profile
+from slope_index import construire_index_pentes, temps_total_index
+from smoothing import FENETRE_LISSAGE, lisser
+from solver import resoudre_vitesse_plate, temps_parcours
+
 
 
 # --- Fonctions ---
@@ -31,14 +38,6 @@ def parse_allure(allure_str):
     total_seconds = minutes * 60 + seconds
     return 1000 / total_seconds  # vitesse en m/s
 
-def minetti_cost_running(i):
-    a, b, c, d, e, f = 155.4, -30.4, -43.3, 46.3, 19.5, 3.6
-    return a * i**5 + b * i**4 + c*i**3 + d*i**2 + e*i + f
-
-def strava_cost(i):
-    a, b, c, d = -3.32959069, 14.61846764, 3.07428877, 1.03357331
-    return a * i**3 + b * i**2 + c*i + d
-
 def allure_to_v_asc(allure,pente):
     """calcul de la vitesse verticale en fonction de l'allure et de la pente
         INPUT:
@@ -68,146 +67,63 @@ def adjusted_speed_strava(flat_speed, slope):
     v = flat_speed*(C0/Ci)
     return v
 
-""" ne sert pas pour le moment
-def smooth(y, box_pts=5):
-    y = np.array(y)
-    n = len(y)
-    y_smooth = np.copy(y)
-    half_window = box_pts // 2
-    for i in range(n):
-        start = max(0, i - half_window)
-        end = min(n, i + half_window + 1)
-        y_smooth[i] = np.mean(y[start:end])
-    return y_smooth
-"""
-
-def simulate_temps_total(flat_speed, distances, elevations):
-    """
-    Calcule le temps total estimé sur un parcours pour une vitesse sur plat donnée,
-    en utilisant les vraies distances entre points successifs.
-
-    Args:
-        flat_speed (float): Vitesse sur plat en m/s.
-        distances (list of float): Distances cumulées en km (vrai chemin parcouru).
-        elevations (list of float): Altitudes correspondantes en mètres.
-
-    Returns:
-        float: Temps total estimé en secondes.
-    """
-    total_time = 0
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
-        v_adj = adjusted_speed_minetti(flat_speed, slope)
-        if v_adj != 0:
-            total_time += d / v_adj
-    return total_time
-
-
+## MOTEUR VECTORISE
+# Les longueurs et pentes des segments sont calculées une seule fois sous forme
+# de tableaux numpy, puis vitesse, temps cumulé et allure sont évalués pour tout
+# le parcours en quelques opérations sur tableaux. Le modèle de coût est choisi
+# par l'argument model (nom ou ModeleCout, voir models.py).
 
-def trouver_vitesse_plate(distances, elevations, temps_espere_sec, precision=1):
+def segment_arrays(distances, elevations):
     """
-    Trouve la vitesse sur plat équivalente pour correspondre au temps espéré
-    en utilisant une recherche par dichotomie.
-
-    Args:
-        distances_pace (list of float): Distances intermédiaires en km.
-        elevations (list of float): Altitudes correspondantes en mètres.
-        temps_espere_sec (float): Temps total espéré en secondes.
-        precision (float): Précision souhaitée en secondes pour l'approximation.
-
-    Returns:
-        float: Vitesse sur plat en m/s.
-    """
-    v_min = 1.0  # m/s
-    v_max = 6.0  # m/s
-    iteration = 0
-
-    while v_max - v_min > 0.0001:
-        iteration += 1
-        v_mid = (v_min + v_max) / 2
-        temps_mid = simulate_temps_total(v_mid, distances, elevations)
-
-        if abs(temps_mid - temps_espere_sec) < precision:
-            return v_mid  # Vitesse trouvée !
-
-        if temps_mid > temps_espere_sec:
-            v_min = v_mid  # Temps trop long -> aller plus vite
-        else:
-            v_max = v_mid  # Temps trop court -> aller moins vite
-
-        if iteration > 100:
-            break
-
-    return (v_min + v_max) / 2
-
-def compute_cumulative_time(flat_speed, distances, elevations):
-    """
-    Calcule cumulative_time proprement à partir de distances et elevations.
-
-    Args:
-        flat_speed (float): vitesse sur plat m/s
-        distances (list of float): distances cumulées (km)
-        elevations (list of float): altitudes (m)
-
-    Returns:
-        list of float: temps cumulé en secondes pour chaque point
-    """
-    cumulative_time = [0.0]
-
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
-        v_adj = adjusted_speed_minetti(flat_speed, slope)
-
-        if v_adj > 0:
-            next_time = cumulative_time[-1] + d / v_adj
-        else:
-            next_time = cumulative_time[-1]
-
-        cumulative_time.append(next_time)
-
-    return cumulative_time
-
-def compute_paces(distances, elevations, flat_speed):
-    """
-    Calcule l'allure ajustée (min/km) pour chaque segment du parcours.
+    Calcule longueurs et pentes de tous les segments du parcours.
 
     Args:
         distances (list of float): Distances cumulées en km.
         elevations (list of float): Altitudes correspondantes en mètres.
-        flat_speed (float): Vitesse sur plat en m/s.
 
     Returns:
-        list of float: Allures ajustées (min/km) pour chaque segment.
+        tuple(np.ndarray, np.ndarray): longueurs des segments en mètres et pentes en %
+        (pente nulle pour les segments de longueur nulle).
     """
-    paces = []
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
-
-        v_adj = adjusted_speed_minetti(flat_speed, slope)
-
-        if v_adj > 0:
-            pace = (1000 / v_adj) / 60  # min/km
-        else:
-            pace = None  # ou pace = valeur maximale comme 70 min/km si tu préfères
+    distances = np.asarray(distances, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+    d = np.diff(distances) * 1000  # mètres
+    dz = np.diff(elevations)
+    slopes = np.zeros_like(d)
+    np.divide(dz, d, out=slopes, where=d != 0)
+    slopes *= 100
+    return d, slopes
+
+def _temps_cumule(speeds_fn, flat_speed, distances, elevations):
+    d, slopes = segment_arrays(distances, elevations)
+    v_adj = speeds_fn(flat_speed, slopes)
+    dt = np.zeros_like(d)
+    np.divide(d, v_adj, out=dt, where=v_adj > 0)
+    cumulative_time = np.empty(len(d) + 1)
+    cumulative_time[0] = 0.0
+    np.cumsum(dt, out=cumulative_time[1:])
+    return cumulative_time
 
-        paces.append(pace)
+def _allures(speeds_fn, flat_speed, distances, elevations):
+    d, slopes = segment_arrays(distances, elevations)
+    v_adj = speeds_fn(flat_speed, slopes)
+    paces = np.full_like(v_adj, np.nan)
+    np.divide(1000, v_adj, out=paces, where=v_adj > 0)
+    paces /= 60  # min/km
     return paces
 
+def _to_list(values):
+    """Convertit un tableau en liste Python, NaN -> None (segments sans allure)."""
+    nan = np.isnan(values)
+    if not nan.any():
+        return values.tolist()
+    out = values.astype(object)
+    out[nan] = None
+    return out.tolist()
 
 
-
-
-## MEMES FONCTIONS MAIS AVEC LE MODELE STRAVA
-
-
-
-def simulate_temps_total_strava(flat_speed, distances, elevations):
+@profile(points="distances")
+def simulate_temps_total(flat_speed, distances, elevations, index=None, model="minetti"):
     """
     Calcule le temps total estimé sur un parcours pour une vitesse sur plat donnée,
     en utilisant les vraies distances entre points successifs.
@@ -216,59 +132,52 @@ def simulate_temps_total_strava(flat_speed, distances, elevations):
         flat_speed (float): Vitesse sur plat en m/s.
         distances (list of float): Distances cumulées en km (vrai chemin parcouru).
         elevations (list of float): Altitudes correspondantes en mètres.
+        index (IndexPentes, optional): Index des pentes ; si fourni, le calcul se fait
+            en O(classes de pente) (voir slope_index.py pour la borne d'erreur).
+        model (str or ModeleCout): Modèle de coût ("minetti", "strava", ...).
 
     Returns:
         float: Temps total estimé en secondes.
     """
-    total_time = 0
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
-        v_adj = adjusted_speed_strava(flat_speed, slope)
-        if v_adj != 0:
-            total_time += d / v_adj
-    return total_time
+    speeds_fn = get_modele(model).vitesses
+    if index is not None:
+        return temps_total_index(speeds_fn, flat_speed, index)
+    d, slopes = segment_arrays(distances, elevations)
+    return temps_parcours(speeds_fn, flat_speed, d, slopes)
 
 
 
-def trouver_vitesse_plate_strava(distances, elevations, temps_espere_sec, precision=1):
+@profile(points="distances")
+def trouver_vitesse_plate(distances, elevations, temps_espere_sec, precision=1, index=None, model="minetti",
+                          details=False):
     """
     Trouve la vitesse sur plat équivalente pour correspondre au temps espéré
-    en utilisant une recherche par dichotomie.
+    (forme fermée T(v) = T(1)/v, voir solver.py).
 
     Args:
-        distances_pace (list of float): Distances intermédiaires en km.
+        distances (list of float): Distances cumulées en km.
         elevations (list of float): Altitudes correspondantes en mètres.
         temps_espere_sec (float): Temps total espéré en secondes.
         precision (float): Précision souhaitée en secondes pour l'approximation.
+        index (IndexPentes, optional): Index des pentes ; si fourni, chaque itération
+            du solveur coûte O(classes de pente) au lieu de O(points).
+        model (str or ModeleCout): Modèle de coût ("minetti", "strava", ...).
+        details (bool): Renvoyer le ResultatSolveur complet (itérations, évaluations, méthode).
 
     Returns:
-        float: Vitesse sur plat en m/s.
+        float: Vitesse sur plat en m/s (ResultatSolveur si details).
     """
-    v_min = 1.0  # m/s
-    v_max = 6.0  # m/s
-    iteration = 0
-
-    while v_max - v_min > 0.0001:
-        iteration += 1
-        v_mid = (v_min + v_max) / 2
-        temps_mid = simulate_temps_total_strava(v_mid, distances, elevations)
-
-        if abs(temps_mid - temps_espere_sec) < precision:
-            return v_mid  # Vitesse trouvée !
-
-        if temps_mid > temps_espere_sec:
-            v_min = v_mid  # Temps trop long -> aller plus vite
-        else:
-            v_max = v_mid  # Temps trop court -> aller moins vite
-
-        if iteration > 100:
-            break
-
-    return (v_min + v_max) / 2
-
-def compute_cumulative_time_strava(flat_speed, distances, elevations):
+    if index is not None:
+        d, slopes = index.metres, index.centres
+    else:
+        d, slopes = segment_arrays(distances, elevations)
+    resultat = resoudre_vitesse_plate(get_modele(model).vitesses, d, slopes, temps_espere_sec, precision)
+    noter(modele=get_modele(model).nom, iterations=resultat.iterations,
+          evaluations=resultat.evaluations, methode=resultat.methode)
+    return resultat if details else resultat.vitesse
+
+@profile(points="distances")
+def compute_cumulative_time(flat_speed, distances, elevations, model="minetti"):
     """
     Calcule cumulative_time proprement à partir de distances et elevations.
 
@@ -276,28 +185,15 @@ def compute_cumulative_time_strava(flat_speed, distances, elevations):
         flat_speed (float): vitesse sur plat m/s
         distances (list of float): distances cumulées (km)
         elevations (list of float): altitudes (m)
+        model (str or ModeleCout): modèle de coût
 
     Returns:
         list of float: temps cumulé en secondes pour chaque point
     """
-    cumulative_time = [0.0]
-
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
-        v_adj = adjusted_speed_strava(flat_speed, slope)
+    return _temps_cumule(get_modele(model).vitesses, flat_speed, distances, elevations).tolist()
 
-        if v_adj > 0:
-            next_time = cumulative_time[-1] + d / v_adj
-        else:
-            next_time = cumulative_time[-1]
-
-        cumulative_time.append(next_time)
-
-    return cumulative_time
-
-def compute_paces_strava(distances, elevations, flat_speed):
+@profile(points="distances")
+def compute_paces(distances, elevations, flat_speed, model="minetti"):
     """
     Calcule l'allure ajustée (min/km) pour chaque segment du parcours.
 
@@ -305,75 +201,85 @@ def compute_paces_strava(distances, elevations, flat_speed):
         distances (list of float): Distances cumulées en km.
         elevations (list of float): Altitudes correspondantes en mètres.
         flat_speed (float): Vitesse sur plat en m/s.
+        model (str or ModeleCout): Modèle de coût.
 
     Returns:
-        list of float: Allures ajustées (min/km) pour chaque segment.
+        list of float: Allures ajustées (min/km) pour chaque segment (None si vitesse nulle).
     """
-    paces = []
-    for i in range(1, len(distances)):
-        d = (distances[i] - distances[i-1]) * 1000  # mètres
-        dz = elevations[i] - elevations[i-1]
-        slope = (dz / d) * 100 if d != 0 else 0
+    return _to_list(_allures(get_modele(model).vitesses, flat_speed, distances, elevations))
 
-        v_adj = adjusted_speed_strava(flat_speed, slope)
 
-        if v_adj > 0:
-            pace = (1000 / v_adj) / 60  # min/km
-        else:
-            pace = None  # ou pace = valeur maximale comme 70 min/km si tu préfères
 
-        paces.append(pace)
-    return paces
 
 
-##-------------------------------------------
+## MEMES FONCTIONS MAIS AVEC LE MODELE STRAVA
 
-def process_gpx(gpx_content):
-    """Lis le fichier GPX et retourne distances, elevations, etc."""
-    gpx = gpxpy.parse(gpx_content)
+def simulate_temps_total_strava(flat_speed, distances, elevations, index=None):
+    return simulate_temps_total(flat_speed, distances, elevations, index, model="strava")
 
-    last_point = None
-    total_distance = 0
-    distances = []
-    elevations = []
-    coords = []
+def trouver_vitesse_plate_strava(distances, elevations, temps_espere_sec, precision=1, index=None):
+    return trouver_vitesse_plate(distances, elevations, temps_espere_sec, precision, index, model="strava")
 
-    DISTANCE_MIN = 30  # mètres entre 2 points retenus
-    distance_since_last_save = 0
+def compute_cumulative_time_strava(flat_speed, distances, elevations):
+    return compute_cumulative_time(flat_speed, distances, elevations, model="strava")
 
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                coords.append((point.latitude, point.longitude))
-                if last_point is not None:
-                    d = point.distance_3d(last_point) or 0
-                    total_distance += d
-                    distance_since_last_save += d
+def compute_paces_strava(distances, elevations, flat_speed):
+    return compute_paces(distances, elevations, flat_speed, model="strava")
 
-                    if distance_since_last_save >= DISTANCE_MIN:
-                        distances.append(total_distance / 1000)  # en km
-                        elevations.append(point.elevation)
-                        distance_since_last_save = 0  # reset après avoir sauvé
-                else:
-                    # Sauvegarder tout premier point
-                    distances.append(total_distance / 1000)
-                    elevations.append(point.elevation)
 
-                last_point = point
+##-------------------------------------------
 
-    distances_pace = [(distances[i] + distances[i-1]) / 2 for i in range(1, len(distances))]
+def charger_course(gpx_content, cache=None, lissage=None, fenetre_lissage=FENETRE_LISSAGE, float32=False,
+                   distance_min=DISTANCE_MIN):
+    """
+    Lis le fichier et retourne le parcours sous forme de Course (tableaux numpy, voir course.py).
+
+    gpx_content peut être le contenu (bytes ou str) ou un fichier ouvert en binaire, au
+    format GPX, TCX, FIT ou GeoJSON (reconnu au contenu, voir formats.py).
+    Si cache (CacheParcours) est fourni, la lecture n'est faite qu'une fois par fichier.
+    Si lissage ("moyenne", "gaussien" ou "savgol") est fourni, les altitudes sont lissées
+    sur une fenêtre de fenetre_lissage mètres (voir smoothing.py).
+    float32 divise par 2 la mémoire du parcours.
+    distance_min (m) règle la décimation du profil (voir gpx_stream.decimer ; 0 garde tous les points).
+    """
+    if cache is not None:
+        if hasattr(gpx_content, "read"):  # le contenu sert deux fois (parcours et altitudes lissées)
+            gpx_content = gpx_content.read()
+        stats_avant = dict(cache.stats)
+        course = Course.depuis_fichier(gpx_content, distance_min, cache=cache, float32=float32)
+        if lissage is not None:
+            course = course.avec_altitudes(
+                cache.altitudes_lissees(gpx_content, lissage, fenetre_lissage, distance_min))
+        noter(**{k: v - stats_avant[k] for k, v in cache.stats.items()})
+    else:
+        course = Course.depuis_fichier(gpx_content, distance_min, float32=float32)
+        if lissage is not None:
+            course = course.avec_altitudes(lisser(course.distances, course.elevations, lissage, fenetre_lissage))
+    noter(points=len(course))
+    return course
+
+@profile()
+def process_gpx(gpx_content, pas_pente=None, cache=None, lissage=None, fenetre_lissage=FENETRE_LISSAGE,
+                distance_min=DISTANCE_MIN):
+    """
+    Lis le fichier GPX et retourne distances, elevations, distances_pace et coords en listes.
 
-    return distances, elevations, distances_pace, coords
+    Couche de compatibilité au-dessus de charger_course() (mêmes arguments).
+    Si pas_pente (en %) est fourni, l'index des pentes du parcours (IndexPentes)
+    est renvoyé en 5e position.
+    """
+    course = charger_course(gpx_content, cache, lissage, fenetre_lissage, distance_min=distance_min)
+    if pas_pente is not None:
+        index = construire_index_pentes(*segment_arrays(course.distances, course.elevations), pas=pas_pente)
+        return (*course.vers_listes(), index)
+    return course.vers_listes()
 
+@profile(points="elevations")
 def calculate_deniv(elevations):
-    d_plus = [0]
-    d_moins = [0]
-    for i in range(1,len(elevations)):
-        deniv_segment = elevations[i]-elevations[i-1]
-        if deniv_segment > 0:
-            d_plus.append(d_plus[-1]+deniv_segment)
-            d_moins.append(d_moins[-1])
-        else:
-            d_plus.append(d_plus[-1])
-            d_moins.append(d_moins[-1]+deniv_segment)
-    return round(d_plus[-1]), round(d_moins[-1])
+    """Dénivelés positif et négatif cumulés (m), arrondis."""
+    dz = np.diff(np.asarray(elevations, dtype=float))
+    if len(dz) == 0:
+        return 0, 0
+    d_plus = np.cumsum(np.where(dz > 0, dz, 0))[-1]
+    d_moins = np.cumsum(np.where(dz > 0, 0, dz))[-1]
+    return round(float(d_plus)), round(float(d_moins))